@@ -0,0 +1,141 @@
+"""
+Frame acquisition policy
+Reads camera frames until one with a usable face turns up, bounded by a
+wall-clock deadline as well as an attempt count so a request with nobody in
+view gives up quickly instead of holding a worker.
+
+Modes:
+  first - stop at the first frame with a face of at least min_face pixels
+  best  - after the first face, keep reading for `window` seconds and take
+          the frame with the largest face
+"""
+
+import os
+import time
+
+import cv2
+
+import metrics
+
+DEADLINE = float(os.environ.get("ACQUIRE_DEADLINE", "3.0"))
+MAX_DEADLINE = float(os.environ.get("ACQUIRE_MAX_DEADLINE", "10.0"))
+MAX_ATTEMPTS = int(os.environ.get("ACQUIRE_MAX_ATTEMPTS", "100"))
+MIN_FACE = int(os.environ.get("ACQUIRE_MIN_FACE", "0"))
+MODE = os.environ.get("ACQUIRE_MODE", "first")
+WINDOW = float(os.environ.get("ACQUIRE_WINDOW", "0.5"))
+
+MODES = ("first", "best")
+
+
+class Policy:
+    def __init__(self, deadline=DEADLINE, max_attempts=MAX_ATTEMPTS, min_face=MIN_FACE,
+                 mode=MODE, window=WINDOW):
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.min_face = min_face
+        self.mode = mode
+        self.window = window
+
+    @classmethod
+    def from_values(cls, values):
+        """Build a policy from request values (deadline, attempts, min_face, mode, window).
+
+        Returns (policy, None) or (None, (message, status)).
+        """
+        try:
+            policy = cls(
+                deadline=float(values.get("deadline", DEADLINE)),
+                max_attempts=int(values.get("attempts", MAX_ATTEMPTS)),
+                min_face=int(values.get("min_face", MIN_FACE)),
+                mode=values.get("mode", MODE),
+                window=float(values.get("window", WINDOW)),
+            )
+        except ValueError:
+            return None, ("Invalid acquisition parameters", 400)
+        if not (0 < policy.deadline <= MAX_DEADLINE):
+            return None, (f"Invalid deadline. Use a value up to {MAX_DEADLINE:g} seconds.", 400)
+        if not (0 < policy.max_attempts <= MAX_ATTEMPTS):
+            return None, (f"Invalid attempts. Use 1-{MAX_ATTEMPTS}.", 400)
+        if policy.min_face < 0 or policy.window < 0:
+            return None, ("Invalid acquisition parameters", 400)
+        if policy.mode not in MODES:
+            return None, ("Invalid mode. Use first or best.", 400)
+        return policy, None
+
+
+class Acquisition:
+    """Outcome of acquire(): the chosen frame (a writable copy) and how it was found"""
+
+    def __init__(self, image, faces, attempts, elapsed, reason):
+        self.image = image      # None when no usable face was seen
+        self.faces = faces
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.reason = reason    # first, best, deadline, attempts or no_frames
+
+    def headers(self):
+        return {
+            "X-Acquire-Attempts": str(self.attempts),
+            "X-Acquire-Time": f"{self.elapsed:.3f}",
+            "X-Acquire-Result": self.reason,
+        }
+
+
+def acquire(camera, locate, policy):
+    """Read frames from camera until the policy is satisfied.
+
+    locate(gray) returns the faces in a frame, e.g. a FaceTracker's detect
+    (one tracked face) or a FaceDetector's detect (everyone in view).
+    """
+    start = time.monotonic()
+    deadline = start + policy.deadline
+    window_end = None
+    best = None  # (face area, frame, faces)
+    attempts = 0
+    seq = 0
+    reason = "attempts"
+
+    while attempts < policy.max_attempts:
+        now = time.monotonic()
+        limit = deadline if window_end is None else min(deadline, window_end)
+        if now >= limit:
+            reason = "best" if window_end is not None and now >= window_end else "deadline"
+            break
+        # Wait for a frame the previous attempt has not seen yet
+        with metrics.timer('camera_read'):
+            frame = camera.wait_for_frame(after=seq, timeout=limit - now)
+        if frame is None:
+            if window_end is not None and time.monotonic() >= window_end:
+                reason = "best"
+            elif attempts == 0:
+                reason = "no_frames"
+            else:
+                reason = "deadline"
+            break
+        attempts += 1
+        metrics.inc(metrics.ATTEMPTS)
+        seq = frame[0]
+
+        with metrics.timer('detect'):
+            gray = cv2.cvtColor(frame[2], cv2.COLOR_BGR2GRAY)
+            faces = [face for face in locate(gray) if face[2] >= policy.min_face]
+        if not faces:
+            continue
+
+        area = max(w * h for (x, y, w, h) in faces)
+        if best is None or area > best[0]:
+            best = (area, frame[2], faces)
+        if policy.mode == "first":
+            reason = "first"
+            break
+        if window_end is None:
+            window_end = time.monotonic() + policy.window
+
+    elapsed = time.monotonic() - start
+    if best is None:
+        return Acquisition(None, [], attempts, elapsed, reason)
+    if reason in ("attempts", "deadline"):
+        # best mode ran out of budget before the window closed; still use the best face
+        reason = "best"
+    # shared frame is read-only, draw on a copy
+    return Acquisition(best[1].copy(), best[2], attempts, elapsed, reason)
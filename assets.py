@@ -0,0 +1,159 @@
+"""
+Static asset pipeline
+Builds small WebP and JPEG thumbnails of the catalog images and copies other
+static assets under fingerprinted names (the name changes whenever the
+content does), so /assets/ can serve them with a one-year immutable cache.
+Outputs are written once to static/build/ and reused on later runs.
+
+Templates use thumbnail(file) for catalog images and asset_url(file) for
+anything in static/assets/. Run `python assets.py` to build ahead of time.
+"""
+
+import hashlib
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import garment_catalog
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(script_dir, "static", "assets")
+BUILD_DIR = os.path.join(script_dir, "static", "build")
+URL_PREFIX = "/assets/"
+
+# Thumbnail width in pixels; the catalog pages show garments 300px wide
+THUMB_WIDTH = int(os.environ.get("THUMB_WIDTH", "300"))
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+# A year: fingerprinted names never change content
+MAX_AGE = 365 * 24 * 3600
+
+_built = {}  # (kind, file[, width]) -> url or thumbnail dict
+_lock = threading.Lock()
+
+
+def _fingerprint(data, *params):
+    digest = hashlib.sha1(data)
+    for param in params:
+        digest.update(str(param).encode())
+    return digest.hexdigest()[:10]
+
+
+def _build_thumbnail(file, width):
+    path = os.path.join(script_dir, file)
+    with open(path, "rb") as f:
+        data = f.read()
+    stem = os.path.splitext(os.path.basename(file))[0]
+    tag = _fingerprint(data, width, JPEG_QUALITY, WEBP_QUALITY)
+    names = {"webp": f"{stem}.{width}.{tag}.webp", "jpeg": f"{stem}.{width}.{tag}.jpg"}
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(file)
+    height = int(round(image.shape[0] * width / image.shape[1]))
+    thumb = None
+    for kind, name in names.items():
+        out = os.path.join(BUILD_DIR, name)
+        if os.path.exists(out):
+            continue
+        if thumb is None:
+            thumb = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        if kind == "webp":
+            ok, buf = cv2.imencode(".webp", thumb, [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY])
+        else:
+            flat = thumb
+            if thumb.ndim == 3 and thumb.shape[2] == 4:
+                # JPEG has no alpha; flatten onto the pages' black background
+                alpha = thumb[:, :, 3:4].astype(np.float32) / 255
+                flat = (thumb[:, :, :3] * alpha).astype(np.uint8)
+            ok, buf = cv2.imencode(".jpg", flat, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            raise IOError(f"Could not encode thumbnail {name}")
+        _write(out, buf.tobytes())
+
+    return {
+        "webp": URL_PREFIX + names["webp"],
+        "jpeg": URL_PREFIX + names["jpeg"],
+        "width": width,
+        "height": height,
+    }
+
+
+def _build_copy(file):
+    path = os.path.join(SOURCE_DIR, file)
+    with open(path, "rb") as f:
+        data = f.read()
+    stem, ext = os.path.splitext(file)
+    name = f"{stem}.{_fingerprint(data)}{ext}"
+    out = os.path.join(BUILD_DIR, name)
+    if not os.path.exists(out):
+        _write(out, data)
+    return URL_PREFIX + name
+
+
+def _write(path, data):
+    # Write then rename so a concurrent reader never sees a partial file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def thumbnail(file, width=None):
+    """Return {"webp", "jpeg", "width", "height"} for a catalog image's thumbnail"""
+    width = width or THUMB_WIDTH
+    key = ("thumb", file, width)
+    result = _built.get(key)
+    if result is None:
+        with _lock:
+            os.makedirs(BUILD_DIR, exist_ok=True)
+            result = _built[key] = _build_thumbnail(file, width)
+    return result
+
+
+def asset_url(file):
+    """Return the fingerprinted URL of a file in static/assets/"""
+    key = ("copy", file)
+    result = _built.get(key)
+    if result is None:
+        with _lock:
+            os.makedirs(BUILD_DIR, exist_ok=True)
+            result = _built[key] = _build_copy(file)
+    return result
+
+
+def build():
+    """Build every catalog thumbnail and static asset; returns the number built"""
+    count = 0
+    for garments in garment_catalog.CATALOG.values():
+        for params in garments.values():
+            thumbnail(params["file"])
+            count += 1
+    for file in sorted(os.listdir(SOURCE_DIR)):
+        asset_url(file)
+        count += 1
+    return count
+
+
+def prune():
+    """Delete build outputs no longer referenced by this process"""
+    keep = set()
+    for result in _built.values():
+        urls = [result["webp"], result["jpeg"]] if isinstance(result, dict) else [result]
+        keep.update(url[len(URL_PREFIX):] for url in urls)
+    removed = 0
+    for name in os.listdir(BUILD_DIR):
+        if name not in keep:
+            os.remove(os.path.join(BUILD_DIR, name))
+            removed += 1
+    return removed
+
+
+if __name__ == '__main__':
+    built = build()
+    removed = prune()
+    total = sum(os.path.getsize(os.path.join(BUILD_DIR, name)) for name in os.listdir(BUILD_DIR))
+    print(f"{built} assets in {BUILD_DIR} ({total / 1024:.0f} KB), {removed} stale files removed")
@@ -0,0 +1,44 @@
+"""
+Background effect
+Blurs the whole frame once (optionally at reduced resolution) and copies the
+blur back through a single mask that leaves the face and garment boxes sharp.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# Set BACKGROUND_BLUR=0 to skip the effect for throughput-sensitive deployments
+ENABLED = os.environ.get("BACKGROUND_BLUR", "1") != "0"
+
+# Resolution the blur runs at, relative to the frame (1.0 = full resolution)
+SCALE = float(os.environ.get("BLUR_SCALE", "1.0"))
+
+KERNEL = 5  # gaussian kernel size at full resolution
+
+
+def blur_background(img, keep_boxes, scale=None, ksize=KERNEL):
+    """Blur img in place everywhere outside keep_boxes.
+
+    keep_boxes are (x1, y1, x2, y2) rectangles (e.g. the face and the garment
+    boxes) that stay sharp. With scale < 1 the blur is computed on a downscaled
+    copy and upsampled, which is cheaper and looks the same for a soft blur.
+    """
+    if scale is None:
+        scale = SCALE
+    height, width = img.shape[:2]
+
+    if scale < 1.0:
+        small = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        k = max(3, int(round(ksize * scale)) | 1)  # kernel must stay odd
+        small = cv2.GaussianBlur(small, (k, k), 0)
+        blurred = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    else:
+        blurred = cv2.GaussianBlur(img, (ksize, ksize), 0)
+
+    mask = np.full((height, width), 255, np.uint8)
+    for (x1, y1, x2, y2) in keep_boxes:
+        mask[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = 0
+    cv2.copyTo(blurred, mask, img)
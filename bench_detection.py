@@ -0,0 +1,128 @@
+"""
+Face detection benchmark
+Compares the current full-resolution detectMultiScale settings against
+downscaled (and optionally equalized) detection on recorded frames.
+
+Usage:
+  python bench_detection.py FRAMES [--limit N] [--min-face 0.08] [--max-face 0.6] [--json out.json]
+
+FRAMES is a directory of images or a video file; no camera is needed.
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+import camera_capture
+import face_detector
+
+# (name, downscale, equalize, use size bounds)
+MODES = [
+    ("baseline", 1, False, False),
+    ("bounded", 1, False, True),
+    ("down2", 2, False, True),
+    ("down2+eq", 2, True, True),
+    ("down3", 3, False, True),
+    ("down4", 4, False, True),
+    ("down4+eq", 4, True, True),
+]
+
+
+def largest(faces):
+    if len(faces) == 0:
+        return None
+    return max((tuple(int(v) for v in face) for face in faces), key=lambda face: face[2] * face[3])
+
+
+def iou(a, b):
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def run_mode(frames, downscale, equalize, bounded, min_face, max_face):
+    detector = face_detector.FaceDetector(
+        downscale=downscale, equalize=equalize,
+        min_face=min_face if bounded else 0, max_face=max_face if bounded else 0,
+    )
+    detector.load()
+    times = []
+    boxes = []
+    for gray in frames:
+        start = time.perf_counter()
+        faces = detector.detect(gray)
+        times.append(time.perf_counter() - start)
+        boxes.append(largest(faces))
+    return np.array(times) * 1000, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("frames", help="directory of images or a video file")
+    parser.add_argument("--limit", type=int, default=None, help="use at most N frames")
+    parser.add_argument("--min-face", type=float, default=0.08, help="min face width / frame width")
+    parser.add_argument("--max-face", type=float, default=0.6, help="max face width / frame width")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    frames = [cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+              for img in camera_capture.iter_frames(args.frames, args.limit)]
+    if not frames:
+        print("ERROR: no frames found in", args.frames)
+        return 1
+
+    print("=" * 78)
+    print(f"Face detection benchmark - {len(frames)} frames, "
+          f"{frames[0].shape[1]}x{frames[0].shape[0]}")
+    print("=" * 78)
+    print(f"{'mode':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8} "
+          f"{'hit rate':>9} {'agree':>7}")
+
+    results = []
+    baseline_time = None
+    baseline_boxes = None
+    for name, downscale, equalize, bounded in MODES:
+        times, boxes = run_mode(frames, downscale, equalize, bounded, args.min_face, args.max_face)
+        if baseline_boxes is None:
+            baseline_time = times.mean()
+            baseline_boxes = boxes
+
+        hits = sum(box is not None for box in boxes)
+        # A frame agrees with the baseline when both miss or the largest faces overlap well
+        agree = sum(
+            (a is None and b is None) or (a is not None and b is not None and iou(a, b) >= 0.5)
+            for a, b in zip(boxes, baseline_boxes)
+        )
+        result = {
+            "mode": name,
+            "downscale": downscale,
+            "equalize": equalize,
+            "bounded": bounded,
+            "mean_ms": float(times.mean()),
+            "p50_ms": float(np.percentile(times, 50)),
+            "p95_ms": float(np.percentile(times, 95)),
+            "speedup": float(baseline_time / times.mean()) if times.mean() else 0.0,
+            "hit_rate": hits / len(frames),
+            "agreement": agree / len(frames),
+        }
+        results.append(result)
+        print(f"{name:<10} {result['mean_ms']:>9.2f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['speedup']:>7.1f}x {result['hit_rate']:>9.1%} {result['agreement']:>7.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"frames": len(frames), "min_face": args.min_face,
+                       "max_face": args.max_face, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,353 @@
+"""
+Load test for the Flask endpoints
+Drives the real app with concurrent clients at increasing concurrency levels
+and reports throughput, latency percentiles, error rates and how far the
+server queues fill up, so deployment capacity is planned from numbers. Runs
+headless: the app's camera replays FRAMES on a loop (CAMERA_SOURCE) and the
+same frames are used as uploads.
+
+Usage:
+  python bench_load.py [FRAMES] [--scenarios predict,upload] [--concurrency 1,2,4,8]
+                       [--duration 10] [--rate N] [--params tier=preview&codec=webp]
+                       [--url http://host:5000] [--out load.json]
+
+Scenarios:
+  predict - POST /predict from the shared camera (the page a browser gets)
+  upload  - POST /api/tryon with an uploaded frame
+  async   - POST /api/tryon?async=1, then poll the job until its image is ready
+  batch   - POST /api/tryon/batch with an uploaded frame and two outfits
+
+FRAMES is a directory of images or a video file; its frames should contain
+faces, or every request ends in a 400. Without FRAMES, 32 synthetic 640x480
+frames of a drawn face that moves around are generated in a temporary
+directory (the real cascade detects it). Without --url the app is started in a
+child process with CAMERA_SOURCE=FRAMES and measured once /ready says it has
+warmed up; server settings (RENDER_WORKERS, JOB_THREADS, ...) come from the
+environment as usual. Against --url the server uses its own camera.
+
+Each client sends its next request as soon as the previous one is answered.
+--rate caps the total request rate of a level instead, which shows latency at
+a fixed offered load. Latency percentiles cover successful (2xx) requests.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import cv2
+import numpy as np
+
+import camera_capture
+
+SCENARIOS = ("predict", "upload", "async", "batch")
+
+# Seconds between polls of an async job and of the server's queue stats
+POLL_INTERVAL = 0.05
+STATS_INTERVAL = 0.25
+REQUEST_TIMEOUT = 60
+
+# Frames generated when FRAMES is omitted
+SYNTHETIC_FRAMES = 32
+SYNTHETIC_SIZE = (640, 480)
+
+
+def http(method, url, data=None, content_type=None):
+    """Send one request; returns (status, headers, body). Connection failures are status 0."""
+    request = urllib.request.Request(url, data=data, method=method)
+    if content_type:
+        request.add_header("Content-Type", content_type)
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+    except (urllib.error.URLError, OSError):
+        return 0, {}, b""
+
+
+def draw_face(img, cx, cy, size):
+    """Draw a cartoon face centred on (cx, cy), size pixels wide, that the Haar cascade detects"""
+    def at(dx, dy):
+        return cx + int(dx * size), cy + int(dy * size)
+
+    def axes(w, h):
+        return int(w * size), int(h * size)
+
+    cv2.ellipse(img, at(0, 0), axes(0.5, 0.65), 0, 0, 360, (150, 180, 215), -1)        # skin
+    cv2.ellipse(img, at(0, -0.45), axes(0.52, 0.3), 0, 180, 360, (40, 50, 60), -1)     # hair
+    for side in (-1, 1):
+        cv2.ellipse(img, at(side * 0.2, -0.2), axes(0.12, 0.04), 0, 0, 360, (50, 60, 70), -1)  # brow
+        cv2.ellipse(img, at(side * 0.2, -0.08), axes(0.1, 0.06), 0, 0, 360, (60, 60, 70), -1)  # eye
+    cv2.line(img, at(0, -0.05), at(0, 0.15), (120, 140, 170), max(1, size // 30))     # nose
+    cv2.ellipse(img, at(0, 0.33), axes(0.17, 0.05), 0, 0, 360, (80, 80, 140), -1)     # mouth
+
+
+def synthetic_frames(directory, count=SYNTHETIC_FRAMES):
+    """Write count JPEG frames of a face drifting and zooming across the frame into directory"""
+    width, height = SYNTHETIC_SIZE
+    for i in range(count):
+        phase = 2 * np.pi * i / count
+        img = np.full((height, width, 3), (70, 90, 110), np.uint8)
+        size = int(110 + 20 * np.sin(2 * phase))
+        draw_face(img, int(width / 2 + 120 * np.sin(phase)), int(height / 3 + 20 * np.cos(phase)), size)
+        # Soften the edges like a camera would; hard edges get fewer detections
+        img = cv2.GaussianBlur(img, (0, 0), size / 60)
+        cv2.imwrite(os.path.join(directory, f"frame{i:03d}.jpg"), img)
+    return directory
+
+
+def load_uploads(spec, limit=32):
+    """JPEG-encode up to limit frames of spec for the upload scenarios"""
+    uploads = []
+    for img in camera_capture.iter_frames(spec, limit):
+        ok, buf = cv2.imencode(".jpg", img)
+        if ok:
+            uploads.append(buf.tobytes())
+    return uploads
+
+
+def run_scenario(name, base, params, upload):
+    """Send one request of scenario name; returns the final HTTP status"""
+    query = "&".join(filter(None, ["shirt=1&pant=1", params]))
+    if name == "predict":
+        status, _, _ = http("POST", f"{base}/predict?{params}",
+                            urllib.parse.urlencode({"shirt": 1, "pant": 1}).encode(),
+                            "application/x-www-form-urlencoded")
+        return status
+    if name == "upload":
+        return http("POST", f"{base}/api/tryon?{query}", upload, "image/jpeg")[0]
+    if name == "batch":
+        batch_query = "&".join(filter(None, ["outfits=1:1,2:2", params]))
+        return http("POST", f"{base}/api/tryon/batch?{batch_query}", upload, "image/jpeg")[0]
+
+    status, headers, _ = http("POST", f"{base}/api/tryon?async=1&{query}", upload, "image/jpeg")
+    if status != 202:
+        return status
+    location = base + headers["Location"]
+    while True:
+        time.sleep(POLL_INTERVAL)
+        status, _, _ = http("GET", location)
+        if status != 202:
+            return status
+
+
+class QueueSampler:
+    """Polls /stats/jobs and /stats/render-pool during a level and keeps the peaks"""
+
+    def __init__(self, base):
+        self.base = base
+        self.peaks = {"jobs_pending": 0, "pool_in_flight": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(STATS_INTERVAL):
+            for path, key, field in (("/stats/jobs", "jobs_pending", ("jobs", "pending")),
+                                     ("/stats/render-pool", "pool_in_flight", ("in_flight",))):
+                status, _, body = http("GET", self.base + path)
+                if status != 200:
+                    continue
+                value = json.loads(body)
+                for name in field:
+                    value = value.get(name, 0) if isinstance(value, dict) else 0
+                self.peaks[key] = max(self.peaks[key], value)
+
+
+def run_level(name, base, params, uploads, concurrency, duration, rate):
+    """Run concurrency clients for duration seconds; returns the level's summary"""
+    results = []  # (status, seconds); list.append is atomic
+    interval = concurrency / rate if rate else 0.0
+    start = time.monotonic()
+    deadline = start + duration
+
+    def client(offset):
+        next_start = start + offset * interval / concurrency
+        sent = offset
+        while True:
+            if interval:
+                now = time.monotonic()
+                if next_start > now:
+                    time.sleep(next_start - now)
+                next_start += interval
+            if time.monotonic() >= deadline:
+                return
+            upload = uploads[sent % len(uploads)] if uploads else b""
+            sent += concurrency
+            request_start = time.perf_counter()
+            status = run_scenario(name, base, params, upload)
+            results.append((status, time.perf_counter() - request_start))
+
+    with QueueSampler(base) as sampler:
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.monotonic() - start
+
+    ok = np.array([seconds for status, seconds in results if 200 <= status < 300]) * 1000
+    errors = {}
+    for status, _ in results:
+        if not 200 <= status < 300:
+            key = str(status) if status else "connection"
+            errors[key] = errors.get(key, 0) + 1
+    percentiles = {f"p{p}_ms": float(np.percentile(ok, p)) if len(ok) else None for p in (50, 95, 99)}
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "offered_rate": rate,
+        "requests": len(results),
+        "throughput": len(ok) / wall if wall else 0.0,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "errors": errors,
+        **percentiles,
+        "max_ms": float(ok.max()) if len(ok) else None,
+        **sampler.peaks,
+    }
+
+
+def serve(port):
+    """Serve the app on port with a threaded server until interrupted (runs in the child process)"""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import flasktry
+
+    # One access log line per request would swamp the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    try:
+        make_server("127.0.0.1", port, flasktry.app, threaded=True).serve_forever()
+    except KeyboardInterrupt:
+        pass  # a normal exit, so the render pool workers are shut down too
+
+
+def start_server(frames, timeout=120):
+    """Start the app on a free local port reading its camera from frames; returns (process, base url)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "-c", f"import bench_load; bench_load.serve({port})"],
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env=dict(os.environ, CAMERA_SOURCE=os.path.abspath(frames)))
+
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, _, body = http("GET", base + "/ready")
+        if status == 200:
+            return process, base
+        if status == 503 and json.loads(body).get("error"):
+            break
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    stop_server(process)
+    raise SystemExit(f"server did not become ready: {body.decode(errors='replace') if status else 'no response'}")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def fmt_ms(value):
+    return f"{value:8.1f}" if value is not None else "       -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("frames", nargs="?", help="directory of images or a video file with faces (default: synthetic)")
+    parser.add_argument("--scenarios", default="predict,upload", help=f"comma separated, from {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--rate", type=float, default=None, help="total requests/sec per level (default: as fast as answered)")
+    parser.add_argument("--params", default="", help="extra query parameters for every request, e.g. tier=preview")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    synthetic = None
+    frames = args.frames
+    if frames is None:
+        synthetic = frames = synthetic_frames(tempfile.mkdtemp(prefix="bench_load_"))
+    process = None
+    results = []
+    try:
+        uploads = load_uploads(frames)
+        if not uploads:
+            print("ERROR: no frames found in", frames)
+            return 1
+
+        if args.url:
+            base = args.url.rstrip("/")
+        else:
+            process, base = start_server(frames)
+
+        print("=" * 78)
+        print(f"Load test against {base}" + (" with synthetic frames" if synthetic else ""))
+        print("=" * 78)
+        for name in scenarios:
+            print(f"\n{name}:")
+            print(f"  {'clients':>7} {'requests':>8} {'req/s':>7} {'errors':>7} "
+                  f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  queue peaks")
+            for concurrency in levels:
+                result = run_level(name, base, args.params, uploads, concurrency, args.duration, args.rate)
+                results.append(result)
+                errors = ", ".join(f"{status} x{count}" for status, count in sorted(result["errors"].items()))
+                print(f"  {concurrency:>7} {result['requests']:>8} {result['throughput']:>7.1f} "
+                      f"{result['error_rate']:>6.0%} {fmt_ms(result['p50_ms'])} {fmt_ms(result['p95_ms'])} "
+                      f"{fmt_ms(result['p99_ms'])} {fmt_ms(result['max_ms'])}  "
+                      f"jobs {result['jobs_pending']}, pool {result['pool_in_flight']}"
+                      + (f"  ({errors})" if errors else ""))
+    finally:
+        if process is not None:
+            stop_server(process)
+        if synthetic:
+            shutil.rmtree(synthetic, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "url": args.url,
+                "frames_source": args.frames or "synthetic",
+                "duration": args.duration,
+                "params": args.params,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
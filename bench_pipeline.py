@@ -0,0 +1,223 @@
+"""
+Offline try-on pipeline benchmark
+Replays recorded frames through load -> detect -> place -> blur -> resize ->
+composite -> encode for every garment combination and frame resolution, and
+reports per-stage latency percentiles, frames/sec and peak RSS. The stages
+are the tryon.py and encoding.py steps /predict runs, so the numbers match
+what is served. place picks the face and the garment boxes; with --no-blur
+there is no blur stage. Runs headless, no camera needed.
+
+Usage:
+  python bench_pipeline.py FRAMES [--resolutions 640x480,1280x720] [--limit N]
+                           [--out baseline.json] [--compare baseline.json]
+
+FRAMES is a directory of images or a video file. Frames where the cascade
+finds no face are dressed at a simulated face position (like test_app.py)
+so every stage is still measured; the miss count is reported. Frames where a
+garment box comes out empty are skipped, as /predict would, and counted.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import camera_capture
+import encoding
+import face_detector
+import garment_catalog
+import tryon
+
+STAGES = ["load", "detect", "place", "blur", "resize", "composite", "encode"]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def parse_resolutions(text):
+    if not text:
+        return [None]
+    resolutions = []
+    for item in text.split(","):
+        width, height = item.lower().split("x")
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def simulated_face(img):
+    """Face box at the top centre of the frame, same as test_app.py"""
+    height, width = img.shape[:2]
+    face_w = width // 4
+    face_h = height // 4
+    return width // 2 - face_w // 2, height // 6, face_w, face_h
+
+
+def timed_frames(spec, limit, resolution):
+    """Yield (seconds spent loading, frame) for each frame of spec"""
+    frames = camera_capture.iter_frames(spec, limit)
+    while True:
+        start = time.perf_counter()
+        img = next(frames, None)
+        if img is not None and resolution is not None:
+            img = cv2.resize(img, resolution, interpolation=cv2.INTER_AREA)
+        elapsed = time.perf_counter() - start
+        if img is None:
+            return
+        yield elapsed, img
+
+
+def run(spec, limit, resolution, shirtno, pantno, detector, blur):
+    outfit = (garment_catalog.get_shirt(shirtno), garment_catalog.get_pant(pantno))
+    output = encoding.Encoding()
+    times = {stage: [] for stage in STAGES if blur or stage != "blur"}
+    frames = 0
+    misses = 0
+    skipped = 0
+    encoded_bytes = 0
+
+    wall_start = time.perf_counter()
+    for load_time, img in timed_frames(spec, limit, resolution):
+        frames += 1
+        times["load"].append(load_time)
+
+        start = time.perf_counter()
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        faces = detector.detect(gray)
+        times["detect"].append(time.perf_counter() - start)
+        if len(faces) == 0:
+            misses += 1
+            faces = [simulated_face(img)]
+
+        start = time.perf_counter()
+        placed = tryon.place(img, faces, [outfit])
+        times["place"].append(time.perf_counter() - start)
+        if placed is None:
+            skipped += 1
+            continue
+        face, layers = placed
+
+        if blur:
+            start = time.perf_counter()
+            tryon.blur_around(img, face, layers, blur)
+            times["blur"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        resized = tryon.resize_layers(layers[0])
+        times["resize"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        tryon.composite(img, resized)
+        times["composite"].append(time.perf_counter() - start)
+
+        data, seconds = output.encode(img, record=False)
+        times["encode"].append(seconds)
+        encoded_bytes += len(data) if data else 0
+    wall = time.perf_counter() - wall_start
+
+    stages = {}
+    for stage, values in times.items():
+        ms = np.array(values) * 1000 if values else np.zeros(1)
+        stages[stage] = {
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "mean_ms": float(ms.mean()),
+        }
+    return {
+        "resolution": "x".join(map(str, resolution)) if resolution else "native",
+        "shirt": shirtno,
+        "pant": pantno,
+        "frames": frames,
+        "face_misses": misses,
+        "skipped": skipped,
+        "fps": frames / wall if wall else 0.0,
+        "avg_encoded_kb": encoded_bytes / (frames - skipped) / 1024 if frames > skipped else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+def compare(results, baseline):
+    """Print the p50 change per stage against a previous run"""
+    previous = {(r["resolution"], r["shirt"], r["pant"]): r for r in baseline["results"]}
+    print("\nChange vs baseline (p50, negative is faster):")
+    for result in results:
+        old = previous.get((result["resolution"], result["shirt"], result["pant"]))
+        if old is None:
+            continue
+        parts = []
+        for stage in STAGES:
+            # Stages one of the runs did not measure (e.g. blur with --no-blur)
+            if stage not in old["stages"] or stage not in result["stages"]:
+                continue
+            before = old["stages"][stage]["p50_ms"]
+            after = result["stages"][stage]["p50_ms"]
+            change = (after - before) / before * 100 if before else 0.0
+            parts.append(f"{stage} {change:+.0f}%")
+        fps_change = (result["fps"] - old["fps"]) / old["fps"] * 100 if old["fps"] else 0.0
+        print(f"  {result['resolution']:>9} shirt{result['shirt']}/pant{result['pant']}: "
+              + ", ".join(parts) + f", fps {fps_change:+.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("frames", help="directory of images or a video file")
+    parser.add_argument("--resolutions", default="", help="comma separated WxH list (default: native)")
+    parser.add_argument("--limit", type=int, default=None, help="use at most N frames per run")
+    parser.add_argument("--no-blur", action="store_true", help="skip the background blur stage")
+    parser.add_argument("--out", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a JSON baseline from an earlier run")
+    args = parser.parse_args()
+
+    detector = face_detector.get_detector()
+    detector.load()
+    garment_catalog.preload()
+
+    combos = [(s, p) for s in sorted(garment_catalog.SHIRTS) for p in sorted(garment_catalog.PANTS)]
+    print("=" * 78)
+    print("Try-on pipeline benchmark")
+    print("=" * 78)
+
+    results = []
+    for resolution in parse_resolutions(args.resolutions):
+        for shirtno, pantno in combos:
+            result = run(args.frames, args.limit, resolution, shirtno, pantno, detector, not args.no_blur)
+            if result["frames"] == 0:
+                print("ERROR: no frames found in", args.frames)
+                return 1
+            results.append(result)
+            stages = result["stages"]
+            print(f"\n{result['resolution']} shirt{shirtno}/pant{pantno}: {result['frames']} frames, "
+                  f"{result['fps']:.1f} fps, {result['face_misses']} without a face, {result['skipped']} skipped, "
+                  f"peak RSS {result['peak_rss_mb']:.0f} MB")
+            for stage in stages:
+                print(f"  {stage:<10} p50 {stages[stage]['p50_ms']:8.2f} ms  "
+                      f"p95 {stages[stage]['p95_ms']:8.2f} ms  p99 {stages[stage]['p99_ms']:8.2f} ms")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "frames_source": args.frames,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,243 @@
+"""
+Shared camera capture
+One background thread owns the capture source and keeps a ring buffer of the
+most recent frames, so request handlers never open the device themselves.
+
+The source can be a device index ("0"), a video file or a directory of
+images, which makes it possible to run the app on a machine with no camera.
+"""
+
+import collections
+import os
+import threading
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class DeviceSource:
+    """A webcam opened with cv2.VideoCapture(index)"""
+
+    def __init__(self, index=0):
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, img = self.cap.read()
+        return img if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource:
+    """A video file played back at its own frame rate, looping at the end.
+
+    With realtime=False frames are returned as fast as they decode.
+    """
+
+    def __init__(self, path, loop=True, realtime=True):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        if not realtime:
+            self.interval = 0.0
+        self.finished = False
+        self._next = time.monotonic()
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        _pace(self)
+        ret, img = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, img = self.cap.read()
+        if not ret:
+            self.finished = True
+        return img if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource:
+    """Still images from a directory, replayed in name order at a fixed rate.
+
+    fps=None returns the images as fast as they decode.
+    """
+
+    def __init__(self, path, fps=30, loop=True):
+        self.path = path
+        self.loop = loop
+        self.interval = 1.0 / fps if fps else 0.0
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.position = 0
+        self.finished = False
+        self._next = time.monotonic()
+
+    def is_opened(self):
+        return len(self.files) > 0
+
+    def read(self):
+        if self.position >= len(self.files):
+            if not self.loop or not self.files:
+                self.finished = True
+                return None
+            self.position = 0
+        _pace(self)
+        img = cv2.imread(self.files[self.position], 1)
+        self.position += 1
+        return img
+
+    def release(self):
+        pass
+
+
+def _pace(source):
+    """Sleep so a file-backed source delivers frames at source.interval"""
+    now = time.monotonic()
+    if source._next > now:
+        time.sleep(source._next - now)
+    source._next = max(source._next, now) + source.interval
+
+
+def open_source(spec, loop=True, realtime=True):
+    """Build a capture source from a device index, video file or image directory"""
+    spec = str(spec)
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps=30 if realtime else None, loop=loop)
+    return VideoFileSource(spec, loop=loop, realtime=realtime)
+
+
+def iter_frames(spec, limit=None):
+    """Yield every frame of a video file or image directory once, unpaced.
+
+    Used by the offline benchmarks; no background thread is involved.
+    """
+    source = open_source(spec, loop=False, realtime=False)
+    if not source.is_opened():
+        raise IOError(f"Cannot open frame source '{spec}'")
+    count = 0
+    try:
+        while limit is None or count < limit:
+            img = source.read()
+            if img is None:
+                if getattr(source, "finished", False):
+                    break
+                continue
+            count += 1
+            yield img
+    finally:
+        source.release()
+
+
+class CaptureService:
+    """Background reader that keeps the latest frames from one source.
+
+    Frames are handed out by reference and marked read-only; callers that want
+    to draw on a frame must copy it first.
+    """
+
+    def __init__(self, source, buffer_size=8):
+        self.source = source
+        self.frames = collections.deque(maxlen=buffer_size)  # (seq, timestamp, frame)
+        self.seq = 0
+        self.read_failures = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def is_opened(self):
+        return self.source.is_opened()
+
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        with self._cond:
+            if self._running or not self.source.is_opened():
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.source.release()
+
+    def _run(self):
+        while self._running:
+            img = self.source.read()
+            if img is None:
+                self.read_failures += 1
+                if getattr(self.source, "finished", False):
+                    break
+                time.sleep(0.01)
+                continue
+            img.flags.writeable = False
+            with self._cond:
+                self.seq += 1
+                self.frames.append((self.seq, time.monotonic(), img))
+                self._cond.notify_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def latest(self):
+        """Return (seq, timestamp, frame) for the newest frame, or None"""
+        with self._cond:
+            return self.frames[-1] if self.frames else None
+
+    def recent(self):
+        """Return the buffered (seq, timestamp, frame) tuples, oldest first"""
+        with self._cond:
+            return list(self.frames)
+
+    def wait_for_frame(self, after=0, timeout=2.0):
+        """Block until a frame newer than seq `after` arrives; None on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.seq <= after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._cond.wait(remaining)
+            return self.frames[-1]
+
+
+_camera = None
+_camera_lock = threading.Lock()
+
+
+def get_camera():
+    """Return the process-wide CaptureService, starting it on first use.
+
+    The source comes from the CAMERA_SOURCE environment variable (default "0").
+    """
+    global _camera
+    with _camera_lock:
+        if _camera is None or not _camera.is_running():
+            if _camera is not None:
+                _camera.stop()
+            source = open_source(os.environ.get("CAMERA_SOURCE", "0"))
+            _camera = CaptureService(source).start()
+        return _camera
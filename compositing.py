@@ -0,0 +1,145 @@
+"""
+Compositing engine
+Places garments relative to a face box and alpha-blends them onto the frame
+in place, with one blend pass per garment.
+"""
+
+import contextlib
+import threading
+
+import cv2
+import numpy as np
+
+import resize_cache
+
+# Float32 weight buffers, checked out for one blend and then kept for the
+# next on any thread (the threaded server starts a thread per request, so
+# per-thread buffers would be allocated again on almost every render)
+MAX_IDLE_BUFFERS = 8
+_idle = []
+_idle_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _weights(count):
+    """Check out two contiguous float32 scratch buffers of count items, grown on demand"""
+    with _idle_lock:
+        buf = _idle.pop() if _idle else None
+    if buf is None or buf.shape[1] < count:
+        buf = np.empty((2, count), np.float32)
+    try:
+        yield buf[0, :count], buf[1, :count]
+    finally:
+        with _idle_lock:
+            if len(_idle) < MAX_IDLE_BUFFERS:
+                _idle.append(buf)
+
+
+def quantize_face(face, quantum):
+    """Snap the face width/height to a multiple of quantum pixels"""
+    x, y, w, h = face
+    if quantum > 1:
+        w = max(quantum, int(round(w / quantum)) * quantum)
+        h = max(quantum, int(round(h / quantum)) * quantum)
+    return x, y, w, h
+
+
+def garment_box(anchor, face, frame_shape):
+    """Return the clipped (x1, y1, x2, y2) box for a garment, or None if empty.
+
+    anchor is (left, width, top, bottom) in face units, see garment_catalog.
+    """
+    x, y, w, h = face
+    left, across, top, bottom = anchor
+    x1 = x + left*w
+    x2 = x1 + across*w
+    y1 = y + top*h
+    y2 = y + bottom*h
+
+    # Check for clipping(whether x1 is coming out to be negative or not..)
+    if x1 < 0:
+        x1 = 0  # top left boundary
+    if x2 > frame_shape[1]:
+        x2 = frame_shape[1]  # bottom right boundary
+    if y1 < 0:
+        y1 = 0  # top boundary
+    if y2 < 0:
+        y2 = 0  # garment entirely above the frame
+    if y2 > frame_shape[0]:
+        y2 = frame_shape[0]  # bottom boundary
+    if y1 > frame_shape[0]:
+        y1 = frame_shape[0]  # bottom boundary
+    if y1 == y2:
+        y1 = 0
+    if y1 > y2:
+        y1, y2 = y2, y1
+
+    # Skip if dimensions are invalid (x2 <= x1: the garment is entirely off one side)
+    if int(x2 - x1) <= 0 or int(abs(y2 - y1)) == 0:
+        return None
+    return int(x1), int(y1), int(x2), int(y2)
+
+
+def resized(image, mask, width, height, interpolation=cv2.INTER_AREA, key=None):
+    """Return image and mask resized to (width, height).
+
+    When key is given the pair comes from the shared resize cache.
+    """
+    if key is not None:
+        return resize_cache.get_cache().get(key, image, mask, width, height, interpolation)
+    garment = cv2.resize(image, (width, height), interpolation=interpolation)
+    if mask is not None:
+        mask = cv2.resize(mask, (width, height), interpolation=interpolation)
+    return garment, mask
+
+
+def blend_resized(img, box, garment, mask=None, opacity=1.0):
+    """Alpha-blend a garment already sized to box into img[box] in place.
+
+    mask (uint8, 255 = garment) is the per-pixel alpha, None means the whole
+    box is covered. opacity scales it.
+    """
+    x1, y1, x2, y2 = box
+    roi = img[y1:y2, x1:x2]
+    height, width = roi.shape[:2]
+
+    # The inverse weights are derived from the resized mask instead of
+    # resizing a second mask
+    with _weights(height * width) as (weights, weights_inv):
+        weights = weights.reshape(height, width)
+        weights_inv = weights_inv.reshape(height, width)
+        if mask is None:
+            weights.fill(opacity)
+        else:
+            np.multiply(mask, opacity / 255.0, out=weights, casting='unsafe')
+        np.subtract(1.0, weights, out=weights_inv)
+
+        # roi = garment * alpha + roi * (1 - alpha), written straight into the frame
+        cv2.blendLinear(garment, roi, weights, weights_inv, dst=roi)
+
+
+def blend(img, box, image, mask=None, opacity=1.0, interpolation=cv2.INTER_AREA, key=None):
+    """Resize image (and mask) to box and alpha-blend it into img[box] in place.
+
+    See resized() and blend_resized().
+    """
+    x1, y1, x2, y2 = box
+    height, width = img[y1:y2, x1:x2].shape[:2]
+    if height == 0 or width == 0:
+        return
+    garment, mask = resized(image, mask, width, height, interpolation, key)
+    blend_resized(img, box, garment, mask, opacity)
+
+
+def dress(img, face, garments, opacity=1.0):
+    """Composite each garment (drawn in list order) onto img for one face box.
+
+    Returns False without touching img if any garment box is empty.
+    """
+    face = quantize_face(face, resize_cache.QUANTUM)
+    boxes = [garment_box(garment.anchor, face, img.shape) for garment in garments]
+    if any(box is None for box in boxes):
+        return False
+    for garment, box in zip(garments, boxes):
+        blend(img, box, garment.image, garment.mask, opacity, key=garment.key)
+    return True
@@ -0,0 +1,90 @@
+"""
+Output encoding
+How a rendered frame is turned into response bytes, chosen per request:
+
+  tier    - thumbnail (longest side 320px), preview (800px) or full (as rendered)
+  codec   - jpeg or webp
+  quality - 1-100; defaults to 95 for JPEG (OpenCV's own default) and 80 for WebP
+
+Frames are only ever scaled down. Encoded sizes and encode times are
+recorded per codec and tier on /metrics.
+"""
+
+import base64
+import os
+import time
+
+import cv2
+
+import metrics
+
+# Longest side in pixels; None keeps the rendered size
+TIERS = {"thumbnail": 320, "preview": 800, "full": None}
+
+# codec -> (extension, mimetype, quality flag, default quality)
+CODECS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY, 95),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY, 80),
+}
+
+TIER = os.environ.get("ENCODE_TIER", "full")
+CODEC = os.environ.get("ENCODE_CODEC", "jpeg")
+
+
+class Encoding:
+    def __init__(self, tier=TIER, codec=CODEC, quality=None):
+        self.tier = tier
+        self.codec = codec
+        self.quality = quality if quality is not None else CODECS[codec][3]
+
+    @classmethod
+    def from_values(cls, values, tier=TIER):
+        """Build an encoding from request values (tier, codec, quality).
+
+        tier is the default when the request does not name one. Returns
+        (encoding, None) or (None, (message, status)).
+        """
+        tier = values.get("tier", tier)
+        if tier not in TIERS:
+            return None, ("Invalid tier. Use thumbnail, preview or full.", 400)
+        codec = values.get("codec", CODEC)
+        if codec not in CODECS:
+            return None, ("Invalid codec. Use jpeg or webp.", 400)
+        try:
+            quality = int(values["quality"]) if values.get("quality") else None
+        except ValueError:
+            return None, ("Invalid quality. Use 1-100.", 400)
+        if quality is not None and not (1 <= quality <= 100):
+            return None, ("Invalid quality. Use 1-100.", 400)
+        return cls(tier, codec, quality), None
+
+    @property
+    def mimetype(self):
+        return CODECS[self.codec][1]
+
+    def encode(self, img, record=True):
+        """Return (encoded bytes or None, seconds taken), recorded on /metrics unless record=False"""
+        start = time.perf_counter()
+        limit = TIERS[self.tier]
+        height, width = img.shape[:2]
+        if limit and max(height, width) > limit:
+            scale = limit / max(height, width)
+            img = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        extension, _, flag, _ = CODECS[self.codec]
+        ok, buf = cv2.imencode(extension, img, [flag, self.quality])
+        data = buf.tobytes() if ok else None
+        seconds = time.perf_counter() - start
+        if record:
+            self.record(data, seconds)
+        return data, seconds
+
+    def record(self, data, seconds):
+        """Add one encode to the size and time metrics (for encodes done in a worker process)"""
+        if data is None or not metrics.ENABLED:
+            return
+        metrics.ENCODE_SECONDS.observe(seconds, codec=self.codec, tier=self.tier)
+        metrics.ENCODED_BYTES.observe(len(data), codec=self.codec, tier=self.tier)
+
+    def data_uri(self, data):
+        return f"data:{self.mimetype};base64," + base64.b64encode(data).decode("ascii")
@@ -0,0 +1,186 @@
+"""
+Shared face detector
+Keeps a bounded pool of loaded haarcascades that detect calls check out and
+return (a CascadeClassifier is not safe to use from two threads at once), so
+the XML is parsed once per pooled instance instead of once per request
+thread or loop iteration, and keeps timing stats
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+import cv2
+
+# Get the directory where this script is located (for absolute paths)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+
+# Run the cascade on a copy downscaled by this factor (1 = full resolution)
+DOWNSCALE = float(os.environ.get("DETECT_DOWNSCALE", "1"))
+
+# Histogram-equalize the (downscaled) frame before detection
+EQUALIZE = os.environ.get("DETECT_EQUALIZE", "0") == "1"
+
+# Expected face width as a fraction of the frame width, from how close to and
+# how far from the camera a customer stands; 0 leaves that bound off
+MIN_FACE = float(os.environ.get("DETECT_MIN_FACE", "0"))
+MAX_FACE = float(os.environ.get("DETECT_MAX_FACE", "0"))
+
+# The frontal-face cascade's own window size; smaller faces are never found
+WINDOW = 24
+
+# Cascades kept loaded, i.e. detections that can run at the same time
+POOL_SIZE = int(os.environ.get("DETECT_POOL", str(os.cpu_count() or 4)))
+
+
+def cascade_path(source=None):
+    """Resolve the cascade XML to load.
+
+    source is "opencv" (the copy shipped with cv2.data.haarcascades),
+    "bundled" (the copy next to this file) or a path to an XML file.
+    Defaults to the FACE_CASCADE environment variable, then "opencv".
+    """
+    if source is None:
+        source = os.environ.get("FACE_CASCADE", "opencv")
+    if source == "opencv":
+        return cv2.data.haarcascades + CASCADE_FILE
+    if source == "bundled":
+        return os.path.join(script_dir, CASCADE_FILE)
+    return source
+
+
+class FaceDetector:
+    """Thread-safe wrapper around a pool of CascadeClassifiers"""
+
+    def __init__(self, source=None, scale_factor=1.3, min_neighbors=5, downscale=DOWNSCALE,
+                 equalize=EQUALIZE, min_face=MIN_FACE, max_face=MAX_FACE, pool_size=POOL_SIZE):
+        self.path = cascade_path(source)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.downscale = max(1.0, downscale)
+        self.equalize = equalize
+        self.min_face = min_face
+        self.max_face = max_face
+        self.pool_size = max(1, pool_size)
+        self._idle = []             # loaded cascades not checked out
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.loads = 0
+        self.load_time = 0.0        # seconds spent parsing the XML, all instances
+        self.last_load_time = 0.0
+        self.detect_calls = 0
+        self.detect_time = 0.0      # seconds spent in detectMultiScale
+        self.last_detect_time = 0.0
+        self.max_detect_time = 0.0
+
+    def _load(self):
+        start = time.perf_counter()
+        cascade = cv2.CascadeClassifier(self.path)
+        elapsed = time.perf_counter() - start
+        if cascade.empty():
+            raise IOError(f"Could not load face detection model '{self.path}'")
+        with self._lock:
+            self.loads += 1
+            self.load_time += elapsed
+            self.last_load_time = elapsed
+        return cascade
+
+    @contextlib.contextmanager
+    def _cascade(self):
+        """Check out a cascade for the calling thread, loading one if none is idle.
+
+        Blocks while pool_size cascades are in use.
+        """
+        with self._slots:
+            with self._lock:
+                cascade = self._idle.pop() if self._idle else None
+            if cascade is None:
+                cascade = self._load()
+            try:
+                yield cascade
+            finally:
+                with self._lock:
+                    self._idle.append(cascade)
+
+    def load(self, count=1):
+        """Load count cascades (at most pool_size) into the pool ahead of the first detects"""
+        with contextlib.ExitStack() as stack:
+            for _ in range(min(count, self.pool_size)):
+                stack.enter_context(self._cascade())
+
+    def detect(self, gray, downscale=None, bounded=True):
+        """Return the face boxes (x, y, w, h) found in a grayscale frame.
+
+        The cascade runs on a copy downscaled by `downscale` (default
+        self.downscale) and the boxes are mapped back to gray's coordinates.
+        bounded=False ignores the min/max face size, e.g. for a small ROI.
+        """
+        if downscale is None:
+            downscale = self.downscale
+        start = time.perf_counter()
+
+        small = gray
+        if downscale > 1.0:
+            size = (max(1, int(gray.shape[1] / downscale)), max(1, int(gray.shape[0] / downscale)))
+            small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        if self.equalize:
+            small = cv2.equalizeHist(small)
+
+        min_size = (0, 0)
+        max_size = (0, 0)
+        if bounded and self.min_face > 0:
+            side = max(WINDOW, int(self.min_face * small.shape[1]))
+            min_size = (side, side)
+        if bounded and self.max_face > 0:
+            side = max(WINDOW, int(self.max_face * small.shape[1]))
+            max_size = (side, side)
+
+        with self._cascade() as cascade:
+            faces = cascade.detectMultiScale(small, self.scale_factor, self.min_neighbors,
+                                             minSize=min_size, maxSize=max_size)
+        if downscale > 1.0 and len(faces):
+            faces = (faces * downscale).round().astype(int)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.detect_calls += 1
+            self.detect_time += elapsed
+            self.last_detect_time = elapsed
+            self.max_detect_time = max(self.max_detect_time, elapsed)
+        return faces
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cascade": self.path,
+                "downscale": self.downscale,
+                "equalize": self.equalize,
+                "pool_size": self.pool_size,
+                "idle": len(self._idle),
+                "loads": self.loads,
+                "load_time": self.load_time,
+                "last_load_time": self.last_load_time,
+                "detect_calls": self.detect_calls,
+                "detect_time": self.detect_time,
+                "avg_detect_time": self.detect_time / self.detect_calls if self.detect_calls else 0.0,
+                "last_detect_time": self.last_detect_time,
+                "max_detect_time": self.max_detect_time,
+            }
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    """Return the process-wide FaceDetector"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = FaceDetector()
+    return _detector
@@ -0,0 +1,158 @@
+"""
+Temporal face tracking
+Runs the full-frame cascade only every N frames (or when the track is lost)
+and otherwise searches a small region around the last face, smoothing the
+box so the garments do not jitter.
+"""
+
+import os
+import threading
+import time
+
+import face_detector
+
+# Full-frame detection every this many frames
+DETECT_EVERY = int(os.environ.get("TRACK_DETECT_EVERY", "5"))
+
+# Weight of the new box in the exponential smoothing (1.0 = no smoothing)
+SMOOTHING = float(os.environ.get("TRACK_SMOOTHING", "0.6"))
+
+# How far around the last box to search, as a fraction of its size
+MARGIN = 0.5
+
+# A track older than this (seconds) is discarded and a full detection is run
+MAX_AGE = 1.0
+
+
+class FaceTracker:
+    """Follows the largest face across frames of one video source"""
+
+    def __init__(self, detector=None, detect_every=DETECT_EVERY, smoothing=SMOOTHING,
+                 margin=MARGIN, max_age=MAX_AGE):
+        self.detector = detector or face_detector.get_detector()
+        self.detect_every = max(1, detect_every)
+        self.smoothing = smoothing
+        self.margin = margin
+        self.max_age = max_age
+        self.box = None             # smoothed (x, y, w, h) as floats
+        self.since_detect = 0
+        self.last_update = 0.0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.full_detections = 0
+        self.roi_detections = 0
+        self.losses = 0
+
+    def reset(self):
+        with self._lock:
+            self.box = None
+
+    def update(self, gray, smooth=True):
+        """Return the tracked faces for this grayscale frame as [(x, y, w, h)] or [].
+
+        The cascade runs outside the lock, so concurrent callers and stats()
+        only wait for the box bookkeeping. With smooth=False the box found in
+        this frame is returned as is (it still seeds the next ROI search).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.box is not None and now - self.last_update > self.max_age:
+                self.box = None
+            self.last_update = now
+            self.since_detect += 1
+            box = self.box
+            use_roi = box is not None and self.since_detect < self.detect_every
+            if use_roi:
+                self.roi_detections += 1
+
+        found = self._search_roi(gray, box) if use_roi else None
+        full = found is None
+        if full:
+            found = self._search_full(gray)
+
+        with self._lock:
+            if use_roi and full:
+                self.losses += 1
+            if full:
+                self.full_detections += 1
+                self.since_detect = 0
+            if found is None:
+                self.box = None
+                return []
+            if smooth:
+                self._smooth(found)
+                found = self.box
+            else:
+                self.box = tuple(float(v) for v in found)
+            x, y, w, h = found
+            return [(int(round(x)), int(round(y)), int(round(w)), int(round(h)))]
+
+    def detect(self, gray):
+        """update() without smoothing, for single-shot requests such as /predict.
+
+        Smoothing only makes sense between consecutive frames of one stream;
+        between independent requests it would pull a still photo toward
+        where the face was last time.
+        """
+        return self.update(gray, smooth=False)
+
+    def _search_full(self, gray):
+        faces = self.detector.detect(gray)
+        if len(faces) == 0:
+            return None
+        # Follow the biggest (closest) face
+        return max((tuple(face) for face in faces), key=lambda face: face[2] * face[3])
+
+    def _search_roi(self, gray, box):
+        x, y, w, h = box
+        dx = self.margin * w
+        dy = self.margin * h
+        x1 = max(0, int(x - dx))
+        y1 = max(0, int(y - dy))
+        x2 = min(gray.shape[1], int(x + w + dx))
+        y2 = min(gray.shape[0], int(y + h + dy))
+        if x2 - x1 < w or y2 - y1 < h:
+            return None
+
+        # Downscale no further than keeps the face comfortably above the
+        # cascade window, and skip the frame-relative size bounds
+        downscale = max(1.0, min(self.detector.downscale, w / (2 * face_detector.WINDOW)))
+        faces = self.detector.detect(gray[y1:y2, x1:x2], downscale=downscale, bounded=False)
+        if len(faces) == 0:
+            return None
+        # Map the closest match back to full-frame coordinates
+        fx, fy, fw, fh = min(faces, key=lambda face: abs(face[0] + x1 - x) + abs(face[1] + y1 - y))
+        return fx + x1, fy + y1, fw, fh
+
+    def _smooth(self, found):
+        if self.box is None:
+            self.box = tuple(float(v) for v in found)
+            return
+        a = self.smoothing
+        self.box = tuple(a * new + (1 - a) * old for new, old in zip(found, self.box))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "detect_every": self.detect_every,
+                "smoothing": self.smoothing,
+                "tracking": self.box is not None,
+                "full_detections": self.full_detections,
+                "roi_detections": self.roi_detections,
+                "losses": self.losses,
+            }
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    """Return the process-wide tracker that follows the shared camera"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = FaceTracker()
+    return _tracker
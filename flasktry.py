@@ -1,299 +1,597 @@
-from flask import Flask, render_template, request
-from flask_cors import CORS
-import numpy as np
-import cv2                              # Library for image processing
-import os
-
-app = Flask(__name__)
-CORS(app)
-
-# Ensure output directory exists
-os.makedirs('static/output', exist_ok=True)
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-@app.route('/shirt.html')
-def plot():
-    return render_template('shirt.html')
-@app.route('/pant.html')
-def ploty():
-    return render_template('pant.html')
-@app.route('/predict', methods=['GET','POST'])
-def predict():
-    try:
-        shirtno = int(request.form["shirt"])
-        pantno = int(request.form["pant"])
-        
-        # Input validation
-        if not (1 <= shirtno <= 4):
-            return "Invalid shirt number. Please select 1-4.", 400
-        if not (1 <= pantno <= 2):
-            return "Invalid pant number. Please select 1-2.", 400
-    except (KeyError, ValueError):
-        return "Missing or invalid form data", 400
-
-    cv2.waitKey(1)
-    cap = cv2.VideoCapture(0)
-    
-    if not cap.isOpened():
-        return "Error: Cannot access camera", 500
-    
-    ih = shirtno
-    i = pantno
-    
-    output_image = None
-    max_attempts = 100  # Limit loop iterations
-    attempt = 0
-    
-    # Get the directory where this script is located (for absolute paths)
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    while attempt < max_attempts:
-        attempt += 1
-        imgarr = [
-            os.path.join(script_dir, "shirt1.png"),
-            os.path.join(script_dir, "shirt2.png"),
-            os.path.join(script_dir, "shirt51.jpg"),
-            os.path.join(script_dir, "shirt6.png")
-        ]
-
-        #ih=input("Enter the shirt number you want to try")
-        imgshirt = cv2.imread(imgarr[ih-1], 1)  # original img in bgr
-        
-        if imgshirt is None:
-            cap.release()
-            return f"Error: Shirt image '{imgarr[ih-1]}' not found", 404
-        
-        if ih == 3:
-            shirtgray = cv2.cvtColor(imgshirt, cv2.COLOR_BGR2GRAY)  # grayscale conversion
-            ret, orig_masks_inv = cv2.threshold(shirtgray, 200, 255, cv2.THRESH_BINARY)
-            orig_masks = cv2.bitwise_not(orig_masks_inv)
-        else:
-            shirtgray = cv2.cvtColor(imgshirt, cv2.COLOR_BGR2GRAY)  # grayscale conversion
-            ret, orig_masks = cv2.threshold(shirtgray, 0, 255, cv2.THRESH_BINARY)
-            orig_masks_inv = cv2.bitwise_not(orig_masks)
-        
-        origshirtHeight, origshirtWidth = imgshirt.shape[:2]
-        
-        if origshirtWidth == 0 or origshirtHeight == 0:
-            cap.release()
-            return "Error: Invalid shirt image dimensions", 400
-        
-        imgarr = [
-            os.path.join(script_dir, "pant7.jpg"),
-            os.path.join(script_dir, "pant21.png")
-        ]
-        #i=input("Enter the pant number you want to try")
-        imgpant = cv2.imread(imgarr[i-1], 1)
-        
-        if imgpant is None:
-            cap.release()
-            return f"Error: Pant image '{imgarr[i-1]}' not found", 404
-        
-        imgpant = imgpant[:, :, 0:3]  # original img in bgr
-        pantgray = cv2.cvtColor(imgpant, cv2.COLOR_BGR2GRAY)  # grayscale conversion
-        
-        if i == 1:
-            ret, orig_mask = cv2.threshold(pantgray, 100, 255, cv2.THRESH_BINARY)
-            orig_mask_inv = cv2.bitwise_not(orig_mask)
-        else:
-            ret, orig_mask = cv2.threshold(pantgray, 50, 255, cv2.THRESH_BINARY)
-            orig_mask_inv = cv2.bitwise_not(orig_mask)
-        
-        origpantHeight, origpantWidth = imgpant.shape[:2]
-        
-        if origpantWidth == 0 or origpantHeight == 0:
-            cap.release()
-            return "Error: Invalid pant image dimensions", 400
-        
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-        ret, img = cap.read()
-        
-        if not ret or img is None:
-            cap.release()
-            return "Error: Cannot read from camera", 500
-       
-        height = img.shape[0]
-        width = img.shape[1]
-        resizewidth = int(width * 3 / 2)
-        resizeheight = int(height * 3 / 2)
-        
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-
-        for (x, y, w, h) in faces:
-            cv2.rectangle(img, (x, y), (x+w, y+h), (255, 0, 0), 2)
-            cv2.rectangle(img, (100, 200), (312, 559), (255, 255, 255), 2)
-            pantWidth = 3 * w  # approx wrt face width
-            pantHeight = pantWidth * origpantHeight / origpantWidth  # preserving aspect ratio of original image
-
-            # Center the pant..just random calculations..
-            if i == 1:
-                x1 = x - w
-                x2 = x1 + 3*w
-                y1 = y + 5*h
-                y2 = y + h*10
-            elif i == 2:
-                x1 = x - w/2
-                x2 = x1 + 2*w
-                y1 = y + 4*h
-                y2 = y + h*9
-            else:
-                x1 = x - w/2
-                x2 = x1 + 5*w/2
-                y1 = y + 5*h
-                y2 = y + h*14
-            # Check for clipping(whether x1 is coming out to be negative or not..)
-
-            if x1 < 0:
-                x1 = 0  # top left boundary
-            if x2 > img.shape[1]:
-                x2 = img.shape[1]  # bottom right boundary
-            if y2 > img.shape[0]:
-                y2 = img.shape[0]  # bottom boundary
-            if y1 > img.shape[0]:
-                y1 = img.shape[0]  # bottom boundary
-            if y1 == y2:
-                y1 = 0
-            temp = 0
-            if y1 > y2:
-                temp = y1
-                y1 = y2
-                y2 = temp
-            
-            # Re-calculate the width and height of the pant image(to resize the image when it wud be pasted)
-            pantWidth = int(abs(x2 - x1))
-            pantHeight = int(abs(y2 - y1))
-            
-            # Skip if dimensions are invalid
-            if pantWidth == 0 or pantHeight == 0:
-                continue
-            
-            x1 = int(x1)
-            x2 = int(x2)
-            y1 = int(y1)
-            y2 = int(y2)
-            
-            # Re-size the original image and the masks to the pant sizes
-            pant = cv2.resize(imgpant, (pantWidth, pantHeight), interpolation=cv2.INTER_AREA)
-            mask = cv2.resize(orig_mask, (pantWidth, pantHeight), interpolation=cv2.INTER_AREA)
-            mask_inv = cv2.resize(orig_mask_inv, (pantWidth, pantHeight), interpolation=cv2.INTER_AREA)
-            
-            # take ROI for pant from background equal to size of pant image
-            roi = img[y1:y2, x1:x2]
-            # roi_bg contains the original image only where the pant is not
-            roi_bg = cv2.bitwise_and(roi, roi, mask=mask_inv)
-            # roi_fg contains the image of the pant only where the pant is
-            roi_fg = cv2.bitwise_and(pant, pant, mask=mask)
-            # join the roi_bg and roi_fg
-            dst = cv2.add(roi_bg, roi_fg)
-            # place the joined image, saved to dst back over the original image
-            
-            # Bounds checking for blur regions
-            blur_y_end = min(y + h, img.shape[0], resizeheight)
-            blur_x_end = min(x + w, img.shape[1], resizewidth)
-            resizewidth = min(resizewidth, img.shape[1])
-            resizeheight = min(resizeheight, img.shape[0])
-            
-            # Apply gaussian blur to background regions
-            blurvalue = 5
-            if y > 0 and resizewidth > 0:
-                top = img[0:y, 0:resizewidth]
-                if top.size > 0:
-                    top = cv2.GaussianBlur(top, (blurvalue, blurvalue), 0)
-                    img[0:y, 0:resizewidth] = top
-            
-            if blur_y_end < resizeheight and resizewidth > 0:
-                bottom = img[blur_y_end:resizeheight, 0:resizewidth]
-                if bottom.size > 0:
-                    bottom = cv2.GaussianBlur(bottom, (blurvalue, blurvalue), 0)
-                    img[blur_y_end:resizeheight, 0:resizewidth] = bottom
-            
-            if x > 0:
-                midleft = img[y:blur_y_end, 0:x]
-                if midleft.size > 0:
-                    midleft = cv2.GaussianBlur(midleft, (blurvalue, blurvalue), 0)
-                    img[y:blur_y_end, 0:x] = midleft
-            
-            if blur_x_end < resizewidth:
-                midright = img[y:blur_y_end, blur_x_end:resizewidth]
-                if midright.size > 0:
-                    midright = cv2.GaussianBlur(midright, (blurvalue, blurvalue), 0)
-                    img[y:blur_y_end, blur_x_end:resizewidth] = midright
-            
-            img[y1:y2, x1:x2] = dst
-
-            # SHIRT OVERLAY
-            shirtWidth = 3 * w  # approx wrt face width
-            shirtHeight = shirtWidth * origshirtHeight / origshirtWidth  # preserving aspect ratio of original image
-            # Center the shirt..just random calculations..
-            x1s = x - w
-            x2s = x1s + 3*w
-            y1s = y + h
-            y2s = y1s + h*4
-            # Check for clipping(whether x1 is coming out to be negative or not..)
-
-            if x1s < 0:
-                x1s = 0
-            if x2s > img.shape[1]:
-                x2s = img.shape[1]
-            if y2s > img.shape[0]:
-                y2s = img.shape[0]
-            temp = 0
-            if y1s > y2s:
-                temp = y1s
-                y1s = y2s
-                y2s = temp
-            
-            # Re-calculate the width and height of the shirt image(to resize the image when it wud be pasted)
-            shirtWidth = int(abs(x2s - x1s))
-            shirtHeight = int(abs(y2s - y1s))
-            
-            # Skip if dimensions are invalid
-            if shirtWidth == 0 or shirtHeight == 0:
-                continue
-            
-            y1s = int(y1s)
-            y2s = int(y2s)
-            x1s = int(x1s)
-            x2s = int(x2s)
-            
-            # Re-size the original image and the masks to the shirt sizes
-            shirt = cv2.resize(imgshirt, (shirtWidth, shirtHeight), interpolation=cv2.INTER_AREA)
-            mask = cv2.resize(orig_masks, (shirtWidth, shirtHeight), interpolation=cv2.INTER_AREA)
-            masks_inv = cv2.resize(orig_masks_inv, (shirtWidth, shirtHeight), interpolation=cv2.INTER_AREA)
-            # take ROI for shirt from background equal to size of shirt image
-            rois = img[y1s:y2s, x1s:x2s]
-            # roi_bg contains the original image only where the shirt is not
-            roi_bgs = cv2.bitwise_and(rois, rois, mask=masks_inv)
-            # roi_fg contains the image of the shirt only where the shirt is
-            roi_fgs = cv2.bitwise_and(shirt, shirt, mask=mask)
-            # join the roi_bg and roi_fg
-            dsts = cv2.add(roi_bgs, roi_fgs)
-            img[y1s:y2s, x1s:x2s] = dsts  # place the joined image, saved to dst back over the original image
-            
-            # Store the output image and break
-            output_image = img.copy()
-            break
-        
-        # If we've processed or no face detected, check if we should continue
-        if output_image is not None:
-            break
-
-    cap.release()  # Destroys the cap object
-
-    # Check if we successfully created an output image
-    if output_image is None:
-        return "Error: No face detected. Please ensure your face is visible to the camera.", 400
-    
-    # Save the output image
-    output_filename = f'output_{shirtno}_{pantno}.jpg'
-    output_path = os.path.join('static', 'output', output_filename)
-    cv2.imwrite(output_path, output_image)
-    
-    # Return the result page with the output image
-    return render_template('index.html', output_image=output_filename)
-if __name__ == '__main__':
-    app.run(host='0.0.0.0',debug=True,port=5000)
+import time
+_import_start = time.perf_counter()
+
+from flask import Flask, Response, jsonify, render_template, request
+from flask_cors import CORS
+from werkzeug.serving import is_running_from_reloader
+import math
+import os
+
+import jobs
+import metrics
+import pages
+import result_cache
+import startup
+
+# Heavy modules load on first use (or during warm-up) instead of at import
+np = startup.lazy("numpy")
+cv2 = startup.lazy("cv2")               # Library for image processing
+acquisition = startup.lazy("acquisition")
+camera_capture = startup.lazy("camera_capture")
+encoding = startup.lazy("encoding")
+face_detector = startup.lazy("face_detector")
+face_tracker = startup.lazy("face_tracker")
+garment_catalog = startup.lazy("garment_catalog")
+garment_store = startup.lazy("garment_store")
+remote_stream = startup.lazy("remote_stream")
+render_pool = startup.lazy("render_pool")
+resize_cache = startup.lazy("resize_cache")
+streaming = startup.lazy("streaming")
+tryon = startup.lazy("tryon")
+
+app = Flask(__name__)
+CORS(app)
+pages.init_app(app)
+
+
+# Outfits one /api/tryon/batch request may render
+MAX_BATCH = int(os.environ.get("BATCH_MAX_OUTFITS", "32"))
+
+# Where the /remote WebSocket server runs when the app is imported (e.g. by a
+# WSGI server): on - a thread in this process, external - `python
+# remote_stream.py` next to it, off - nowhere. `python flasktry.py` always
+# starts it.
+REMOTE_STREAM = os.environ.get("REMOTE_STREAM", "off")
+
+
+def collect_stats():
+    """Detector, tracker and cache counters exported on /metrics"""
+    detector = face_detector.get_detector().stats()
+    tracker = face_tracker.get_tracker().stats()
+    cache = resize_cache.get_cache().stats()
+    results = result_cache.get_cache().stats()
+    ready = startup.status()
+    return {
+        "tryon_cascade_loads_total": ("Haarcascade XML loads", "counter", detector["loads"]),
+        "tryon_cascade_load_seconds_total": ("Time spent loading the haarcascade", "counter", detector["load_time"]),
+        "tryon_detect_calls_total": ("detectMultiScale calls", "counter", detector["detect_calls"]),
+        "tryon_detect_seconds_total": ("Time spent in detectMultiScale", "counter", detector["detect_time"]),
+        "tryon_tracker_full_detections_total": ("Full-frame detections by the shared tracker", "counter", tracker["full_detections"]),
+        "tryon_tracker_roi_detections_total": ("ROI detections by the shared tracker", "counter", tracker["roi_detections"]),
+        "tryon_resize_cache_hits_total": ("Resized garment cache hits", "counter", cache["hits"]),
+        "tryon_resize_cache_misses_total": ("Resized garment cache misses", "counter", cache["misses"]),
+        "tryon_resize_cache_entries": ("Resized garments currently cached", "gauge", cache["size"]),
+        "tryon_resize_cache_bytes": ("Memory used by cached resized garments", "gauge", cache["bytes"]),
+        "tryon_result_cache_memory_bytes": ("Async job results held in memory", "gauge", results["memory_bytes"]),
+        "tryon_result_cache_disk_bytes": ("Async job results spilled to disk", "gauge", results["disk_bytes"]),
+        "tryon_import_seconds": ("Time importing the app took", "gauge", ready["import_seconds"] or 0),
+        "tryon_warm_up_seconds": ("Time the warm-up took", "gauge", ready["warm_up_seconds"] or 0),
+        "tryon_ready": ("1 once warm-up has finished", "gauge", int(ready["ready"])),
+    }
+
+
+metrics.register_collector(collect_stats)
+
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+@app.route('/shirt.html')
+def plot():
+    return render_template('shirt.html')
+@app.route('/pant.html')
+def ploty():
+    return render_template('pant.html')
+@app.route('/remote')
+def remote():
+    # Try-on with the visitor's own camera over the remote_stream WebSocket
+    return render_template('remote.html', port=remote_stream.PORT,
+                           available=REMOTE_STREAM == "external" or remote_stream.is_running())
+@app.route('/ready')
+def ready():
+    # Healthy only once warm-up has loaded the detector and catalog and rendered a frame
+    return jsonify(startup.status()), 200 if startup.is_ready() else 503
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+@app.route('/stats/detector')
+def detector_stats():
+    return jsonify(face_detector.get_detector().stats())
+@app.route('/stats/tracker')
+def tracker_stats():
+    return jsonify(face_tracker.get_tracker().stats())
+@app.route('/stats/render-pool')
+def render_pool_stats():
+    pool = render_pool.get_pool()
+    return jsonify(pool.stats() if pool else {"workers": 0})
+@app.route('/stats/resize-cache')
+def resize_cache_stats():
+    return jsonify(resize_cache.get_cache().stats())
+@app.route('/stats/garments')
+def garment_stats():
+    store = garment_store.get_store(garment_catalog.PREPARED_DIR)
+    cache = garment_catalog.cache_info()
+    return jsonify(
+        catalog={kind: len(garments) for kind, garments in garment_catalog.CATALOG.items()},
+        cache={"hits": cache.hits, "misses": cache.misses, "size": cache.currsize, "max_size": cache.maxsize},
+        store=store.stats() if store else None,
+    )
+@app.route('/stats/jobs')
+def job_stats():
+    return jsonify(jobs=jobs.get_queue().stats(), results=result_cache.get_cache().stats())
+
+
+def parse_selection(values):
+    """Read the shirt/pant numbers from form or query values.
+
+    Returns ((shirtno, pantno), None) or (None, (message, status)).
+    """
+    try:
+        shirtno = int(values["shirt"])
+        pantno = int(values["pant"])
+    except (KeyError, ValueError):
+        return None, ("Missing or invalid form data", 400)
+
+    # Input validation
+    if not garment_catalog.exists("shirt", shirtno):
+        return None, ("Invalid shirt number. Please pick one from the catalog.", 400)
+    if not garment_catalog.exists("pant", pantno):
+        return None, ("Invalid pant number. Please pick one from the catalog.", 400)
+    return (shirtno, pantno), None
+
+
+def load_pipeline(shirtno, pantno):
+    """Fetch the garments and the face detector for one render.
+
+    Returns ((shirt_garment, pant_garment, detector), None) or (None, (message, status)).
+    """
+    try:
+        shirt_garment = garment_catalog.get_shirt(shirtno)
+        pant_garment = garment_catalog.get_pant(pantno)
+    except FileNotFoundError as e:
+        return None, (f"Error: Garment image '{e}' not found", 404)
+
+    detector = face_detector.get_detector()
+    try:
+        with metrics.timer('cascade_load'):
+            detector.load()
+    except IOError as e:
+        return None, (f"Error: {e}", 500)
+    return (shirt_garment, pant_garment, detector), None
+
+
+def load_outfits(outfits):
+    """load_pipeline() for several (shirtno, pantno) selections.
+
+    Returns (([(shirt_garment, pant_garment)], detector), None) or (None, (message, status)).
+    """
+    garments = []
+    for shirtno, pantno in outfits:
+        pipeline, error = load_pipeline(shirtno, pantno)
+        if error:
+            return None, error
+        garments.append(pipeline[:2])
+    return (garments, pipeline[2]), None
+
+
+def parse_people(values, selection):
+    """Read the multi-person options.
+
+    people=all dresses every face instead of the first one; outfits
+    ("1:1,2:2") then gives each person's shirt:pant from left to right,
+    otherwise everyone wears the shirt/pant selection.
+    Returns ((outfits, multi), None) or (None, (message, status)).
+    """
+    multi = values.get('people') == 'all'
+    if not multi or not values.get('outfits'):
+        return ([selection], multi), None
+    outfits, error = parse_outfits(values['outfits'])
+    if error:
+        return None, error
+    return (outfits, True), None
+
+
+@app.route('/predict', methods=['GET','POST'])
+def predict():
+    selection, error = parse_selection(request.form)
+    if error:
+        return error
+    people, error = parse_people(request.values, selection)
+    if error:
+        return error
+    outfits, multi = people
+    policy, error = acquisition.Policy.from_values(request.values)
+    if error:
+        return error
+    output, error = encoding.Encoding.from_values(request.values)
+    if error:
+        return error
+    response_mode = request.values.get('response', 'page')
+    if response_mode not in ('page', 'bytes', 'datauri'):
+        return "Invalid response. Use page, bytes or datauri.", 400
+
+    metrics.inc(metrics.REQUESTS, endpoint='predict')
+    with metrics.timer('camera_open'):
+        camera = camera_capture.get_camera()
+    if not camera.is_opened():
+        return "Error: Cannot access camera", 500
+
+    pipeline, error = load_outfits(outfits)
+    if error:
+        return error
+    garments, detector = pipeline
+
+    if multi:
+        # Everyone in view, so every face from a full-frame detection
+        locate = detector.detect
+    else:
+        # The shared camera has one shared tracker, so a face found by an earlier
+        # request is searched for locally instead of scanning the whole frame;
+        # each request is a single shot, so the box is not smoothed
+        locate = face_tracker.get_tracker().detect
+
+    acquired = acquisition.acquire(camera, locate, policy)
+    headers = acquired.headers()
+    if acquired.reason == 'no_frames':
+        return "Error: Cannot read from camera", 500, headers
+
+    # Dress and encode in memory (in the render pool when there is one)
+    dressed, data = 0, None
+    if acquired.image is not None:
+        rendered, error = render_frame(acquired.image, outfits, garments, detector, multi, acquired.faces, output)
+        if error:
+            return error
+        dressed, data = rendered
+    headers['X-People-Dressed'] = str(dressed)
+    if not dressed:
+        metrics.inc(metrics.NO_FACE, endpoint='predict')
+        return "Error: No face detected. Please ensure your face is visible to the camera.", 400, headers
+    if data is None:
+        return "Error: Could not encode output image", 500
+    if response_mode != 'page':
+        return encoded_response(data, output, response_mode, headers)
+
+    # Return the result page with the output image embedded
+    return render_template('index.html', output_image=output.data_uri(data)), headers
+
+
+def encoded_response(data, output, response_mode, headers=None):
+    """Send encoded image bytes as they are (bytes) or as JSON with a data URI (datauri)"""
+    if response_mode == 'datauri':
+        return jsonify(image=output.data_uri(data), codec=output.codec, tier=output.tier, bytes=len(data)), headers or {}
+    return Response(data, mimetype=output.mimetype, headers=headers)
+
+
+def read_upload():
+    """Decode the uploaded JPEG/PNG (multipart field "image" or raw body).
+
+    Returns (img, None) or (None, (message, status)).
+    """
+    upload = request.files.get('image')
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return None, ("Missing image upload", 400)
+
+    with metrics.timer('decode'):
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None, ("Error: Could not decode image. Please upload a JPEG or PNG.", 400)
+    return img, None
+
+
+def parse_outfits(text):
+    """Parse "1:1,2:1" (shirt:pant pairs) or "all" into a list of selections.
+
+    Returns (list, None) or (None, (message, status)).
+    """
+    if not text or text == 'all':
+        outfits = [(s, p) for s in garment_catalog.SHIRTS for p in garment_catalog.PANTS]
+        if len(outfits) > MAX_BATCH:
+            return None, (f"The catalog has {len(outfits)} combinations; list up to {MAX_BATCH} outfits instead of all.", 400)
+        return outfits, None
+    outfits = []
+    for item in text.split(','):
+        shirt, _, pant = item.partition(':')
+        selection, error = parse_selection({"shirt": shirt, "pant": pant})
+        if error:
+            return None, error
+        outfits.append(selection)
+    if len(outfits) > MAX_BATCH:
+        return None, (f"Too many outfits. Please list up to {MAX_BATCH}.", 400)
+    return outfits, None
+
+
+@app.route('/api/tryon', methods=['POST'])
+def api_tryon():
+    """Dress an uploaded photo instead of a webcam frame.
+
+    The JPEG/PNG comes either as the multipart file field "image" or as the raw
+    request body; shirt and pant are passed as form fields or query parameters
+    (people=all and outfits as for parse_people() dress everyone in the photo).
+    tier, codec and quality pick the encoding (see encoding.py). The result is
+    returned as image bytes straight from memory, or with response=datauri as
+    JSON holding a data URI. With async=1 the render runs in the background
+    and a job id is returned instead; poll GET /api/tryon/<job id> for the
+    image bytes.
+    """
+    selection, error = parse_selection(request.values)
+    if error:
+        return error
+    people, error = parse_people(request.values, selection)
+    if error:
+        return error
+    outfits, multi = people
+    output, error = encoding.Encoding.from_values(request.values)
+    if error:
+        return error
+    response_mode = request.values.get('response', 'bytes')
+    if response_mode not in ('bytes', 'datauri'):
+        return "Invalid response. Use bytes or datauri.", 400
+
+    metrics.inc(metrics.REQUESTS, endpoint='api_tryon')
+    img, error = read_upload()
+    if error:
+        return error
+
+    if request.values.get('async') == '1':
+        try:
+            job = jobs.get_queue().submit(render_upload, img, outfits, multi, output, mimetype=output.mimetype)
+        except jobs.QueueFull:
+            return "Server busy, please retry", 503, {'Retry-After': '1'}
+        return jsonify(job.stats()), 202, {'Location': f'/api/tryon/{job.id}'}
+
+    data, error = render_upload(img, outfits, multi, output)
+    if error:
+        return error
+    return encoded_response(data, output, response_mode)
+@app.route('/api/tryon/<job_id>')
+def api_tryon_job(job_id):
+    """Status of an async try-on job, or the image once it is done"""
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        return "Unknown or expired job", 404
+    if job.status in ('queued', 'running'):
+        return jsonify(job.stats()), 202, {'Retry-After': '1'}
+    if job.status == 'failed':
+        return jsonify(job.stats()), job.error[1]
+
+    result = result_cache.get_cache().get(job.id)
+    if result is None:
+        return "Result expired", 410
+    data, mimetype = result
+    return Response(data, mimetype=mimetype)
+
+
+def render_upload(img, outfits, multi=False, output=None):
+    """Dress an uploaded frame in outfits ([(shirtno, pantno)]) and encode it with output.
+
+    Returns (encoded bytes, None) or (None, (message, status[, headers])).
+    """
+    if output is None:
+        output = encoding.Encoding()
+    pipeline, error = load_outfits(outfits)
+    if error:
+        return None, error
+    garments, detector = pipeline
+    rendered, error = render_frame(img, outfits, garments, detector, multi, output=output)
+    if error:
+        return None, error
+    dressed, data = rendered
+    if not dressed:
+        metrics.inc(metrics.NO_FACE, endpoint='api_tryon')
+        return None, ("Error: No face detected in the uploaded image.", 400)
+    if data is None:
+        return None, ("Error: Could not encode output image", 500)
+    return data, None
+
+
+def render_frame(img, outfits, garments, detector, multi=False, faces=None, output=None):
+    """tryon.dress() img in outfits and encode it with output, in the render pool when there is one.
+
+    garments and detector are load_outfits(outfits)'s; faces are detected
+    when None. Returns ((people dressed, encoded bytes or None), None) or
+    (None, (message, status[, headers])).
+    """
+    pool = render_pool.get_pool()
+    if pool is not None:
+        return render_in_pool(pool, pool.render, img, outfits, multi, output, faces)
+
+    if faces is None:
+        with metrics.timer('detect'):
+            faces = detector.detect(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    dressed = tryon.dress(img, faces, garments, multi)
+    data = None
+    if dressed:
+        with metrics.timer('encode'):
+            data, _ = output.encode(img)
+    return (dressed, data), None
+
+
+def render_batch(img, outfits, garments, detector, faces=None, labels=None, output=None):
+    """tryon.dress_batch() img in outfits and encode the results, in the render pool when there is one.
+
+    Encodes one contact sheet with labels, else one image per outfit;
+    garments, detector and faces as for render_frame(). Returns ([encoded bytes or None] or None when no
+    face fits, None) or (None, (message, status[, headers])).
+    """
+    pool = render_pool.get_pool()
+    if pool is not None:
+        return render_in_pool(pool, pool.render_batch, img, outfits, faces, labels, output)
+
+    if faces is None:
+        with metrics.timer('detect'):
+            faces = detector.detect(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    results = tryon.dress_batch(img, faces, garments)
+    if results is None:
+        return None, None
+    if labels is not None:
+        results = [tryon.contact_sheet(results, labels)]
+    encoded = []
+    for result in results:
+        with metrics.timer('encode'):
+            encoded.append(output.encode(result)[0])
+    return encoded, None
+
+
+def render_in_pool(pool, render, *args):
+    """Call render (a method of pool) with args and turn the pool's failures into responses.
+
+    Returns (result, None) or (None, (message, status[, headers])).
+    """
+    try:
+        with metrics.timer('pool_render'):
+            return render(*args), None
+    except render_pool.PoolFull:
+        return None, ("Server busy, please retry", 503, {'Retry-After': '1'})
+    except render_pool.RenderTimeout:
+        return None, ("Error: Render timed out", 504)
+    except render_pool.PoolBroken:
+        # A worker died; later requests get a fresh pool
+        render_pool.replace_pool(pool)
+        return None, ("Server busy, please retry", 503, {'Retry-After': '1'})
+    except FileNotFoundError as e:
+        return None, (f"Error: Garment image '{e}' not found", 404)
+
+
+@app.route('/api/tryon/batch', methods=['POST'])
+def api_tryon_batch():
+    """Dress one frame in several outfits with a single detection.
+
+    outfits is "1:1,2:2" (shirt:pant pairs) or "all" (the default, every
+    combination). The frame is an uploaded image, or the shared camera when
+    no image is sent. format=sheet (default) returns one contact sheet image,
+    format=json a list of data URIs; tier, codec and quality pick their
+    encoding (see encoding.py).
+    """
+    outfits, error = parse_outfits(request.values.get('outfits'))
+    if error:
+        return error
+    output_format = request.values.get('format', 'sheet')
+    if output_format not in ('sheet', 'json'):
+        return "Invalid format. Use sheet or json.", 400
+    output, error = encoding.Encoding.from_values(request.values)
+    if error:
+        return error
+    policy, error = acquisition.Policy.from_values(request.values)
+    if error:
+        return error
+
+    pipeline, error = load_outfits(outfits)
+    if error:
+        return error
+    garments, detector = pipeline
+    metrics.inc(metrics.REQUESTS, endpoint='api_tryon_batch')
+
+    labels = None
+    if output_format == 'sheet':
+        labels = [f"shirt {shirtno} / pant {pantno}" for shirtno, pantno in outfits]
+
+    headers = {}
+    encoded = None
+    # A form-encoded body only carries parameters, not an image
+    if request.files.get('image') or (request.content_length and not request.form):
+        img, error = read_upload()
+        if error:
+            return error
+        encoded, error = render_batch(img, outfits, garments, detector, labels=labels, output=output)
+        if error:
+            return error
+    else:
+        camera = camera_capture.get_camera()
+        if not camera.is_opened():
+            return "Error: Cannot access camera", 500
+        acquired = acquisition.acquire(camera, face_tracker.get_tracker().detect, policy)
+        headers = acquired.headers()
+        if acquired.reason == 'no_frames':
+            return "Error: Cannot read from camera", 500, headers
+        if acquired.image is not None:
+            encoded, error = render_batch(acquired.image, outfits, garments, detector, acquired.faces, labels, output)
+            if error:
+                return error
+
+    if encoded is None:
+        metrics.inc(metrics.NO_FACE, endpoint='api_tryon_batch')
+        return "Error: No face detected. Please ensure your face is visible to the camera.", 400, headers
+    if any(data is None for data in encoded):
+        return "Error: Could not encode output image", 500
+
+    if output_format == 'sheet':
+        return Response(encoded[0], mimetype=output.mimetype, headers=headers)
+    return jsonify(outfits=[{
+        "shirt": shirtno,
+        "pant": pantno,
+        "image": output.data_uri(data),
+    } for (shirtno, pantno), data in zip(outfits, encoded)]), headers
+
+
+@app.route('/stream')
+def stream():
+    """Live MJPEG try-on stream: /stream?shirt=1&pant=2[&fps=10][&session=<id>]
+
+    The selection can be changed mid-stream with POST /stream/<session id>.
+    """
+    selection, error = parse_selection(request.args)
+    if error:
+        return error
+    shirtno, pantno = selection
+    try:
+        fps = float(request.args.get('fps', streaming.MAX_FPS))
+        if not math.isfinite(fps) or fps <= 0:
+            raise ValueError
+    except ValueError:
+        return "Invalid fps", 400
+
+    camera = camera_capture.get_camera()
+    if not camera.is_opened():
+        return "Error: Cannot access camera", 500
+
+    pipeline, error = load_pipeline(shirtno, pantno)
+    if error:
+        return error
+
+    session = streaming.open_session(shirtno, pantno, fps, request.args.get('session'))
+    response = Response(streaming.generate(session, camera),
+                        mimetype=f'multipart/x-mixed-replace; boundary={streaming.BOUNDARY}')
+    response.headers['X-Stream-Session'] = session.id
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+@app.route('/stream/sessions')
+def stream_sessions():
+    return jsonify(streaming.sessions())
+@app.route('/stream/<session_id>', methods=['POST'])
+def stream_select(session_id):
+    session = streaming.get_session(session_id)
+    if session is None:
+        return "Unknown stream session", 404
+    selection, error = parse_selection(request.values)
+    if error:
+        return error
+    pipeline, error = load_pipeline(*selection)
+    if error:
+        return error
+    session.select(*selection)
+    return jsonify(session.stats())
+
+
+startup.imported(time.perf_counter() - _import_start)
+# Imported by a server. Render workers spawned under `python flasktry.py`
+# re-import this script as __mp_main__; they must not warm up a pool of their own
+_imported_by_server = __name__ not in ('__main__', '__mp_main__')
+if _imported_by_server and startup.WARM_UP == "background":
+    startup.start_background()
+if _imported_by_server and REMOTE_STREAM == "on":
+    # Only one process can bind the port; with several WSGI worker
+    # processes run it externally instead
+    remote_stream.start_in_thread()
+
+
+if __name__ == '__main__':
+    # The debug reloader runs the app in a child process and the parent only
+    # watches files; warm up and serve WebSockets in the child alone
+    if is_running_from_reloader():
+        if not startup.warm_up():
+            print(f"Warm-up failed: {startup.status()['error']}")
+        status = startup.status()
+        print(f"Imported in {status['import_seconds']:.2f}s, warmed up in {status['warm_up_seconds'] or 0:.2f}s")
+        remote_stream.start_in_thread()
+    app.run(host='0.0.0.0',debug=True,port=5000)
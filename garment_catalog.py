@@ -0,0 +1,222 @@
+"""
+Garment catalog
+Reads the garment manifest (garments.json) once and validates it. Each
+garment image is loaded on first use and kept, with its mask and placement
+parameters, in a bounded cache so /predict never touches the disk. Garments
+prepared by ingest_garments.py are views into the shared memory-mapped
+garment store, with their cleaned alpha; the rest are decoded and masked by
+thresholding.
+
+A manifest entry looks like
+  {"id": 1, "name": "black shirt", "file": "shirt1.png",
+   "mask": "threshold", "threshold": 0, "anchor": [-1, 3, 1, 5]}
+  mask      - threshold: pixels brighter than `threshold` are the garment
+              threshold_inv: pixels darker than it (light background)
+  anchor    - (left, width, top, bottom) in face-width/face-height units,
+              so the garment box is x + left*w .. + width*w, y + top*h .. y + bottom*h
+"""
+
+import functools
+import json
+import numbers
+import os
+
+import cv2
+
+import garment_store
+
+# Get the directory where this script is located (for absolute paths)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+MANIFEST = os.environ.get("GARMENT_MANIFEST", os.path.join(script_dir, "garments.json"))
+
+# Output of ingest_garments.py: the memory-mapped garment store
+PREPARED_DIR = os.environ.get("GARMENT_PREPARED", os.path.join(script_dir, "prepared"))
+
+# Upper bound on decoded garments kept in memory at once
+CACHE_SIZE = int(os.environ.get("GARMENT_CACHE_SIZE", "64"))
+
+KINDS = ("shirt", "pant")
+MASKS = ("threshold", "threshold_inv")
+_FIELDS = {"id", "name", "file", "mask", "threshold", "anchor"}
+
+
+class ManifestError(ValueError):
+    """Raised when the garment manifest is malformed"""
+
+
+def _validate(kind, index, entry):
+    where = f"{kind}[{index}]"
+    if not isinstance(entry, dict):
+        raise ManifestError(f"{where}: expected an object")
+    unknown = set(entry) - _FIELDS
+    if unknown:
+        raise ManifestError(f"{where}: unknown fields {sorted(unknown)}")
+    for field in ("id", "file", "anchor"):
+        if field not in entry:
+            raise ManifestError(f"{where}: missing '{field}'")
+
+    number = entry["id"]
+    if not isinstance(number, int) or isinstance(number, bool) or number < 1:
+        raise ManifestError(f"{where}: id must be a positive integer")
+    if not isinstance(entry["file"], str) or not entry["file"]:
+        raise ManifestError(f"{where}: file must be a non-empty string")
+    mask = entry.get("mask", "threshold")
+    if mask not in MASKS:
+        raise ManifestError(f"{where}: mask must be one of {', '.join(MASKS)}")
+    threshold = entry.get("threshold", 0)
+    if not isinstance(threshold, int) or not (0 <= threshold <= 255):
+        raise ManifestError(f"{where}: threshold must be an integer 0-255")
+    anchor = entry["anchor"]
+    if (not isinstance(anchor, list) or len(anchor) != 4
+            or not all(isinstance(v, numbers.Real) and not isinstance(v, bool) for v in anchor)):
+        raise ManifestError(f"{where}: anchor must be [left, width, top, bottom]")
+    if anchor[1] <= 0 or anchor[3] <= anchor[2]:
+        raise ManifestError(f"{where}: anchor width must be positive and bottom below top")
+
+    return number, {
+        "name": entry.get("name") or f"{kind} {number}",
+        "file": entry["file"],
+        "mask": mask,
+        "threshold": threshold,
+        "anchor": tuple(anchor),
+    }
+
+
+def load_manifest(path=MANIFEST):
+    """Read and validate a manifest; returns {kind: {id: params}} sorted by id"""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ManifestError(f"{path}: {e}") from None
+    if not isinstance(manifest, dict) or set(manifest) - set(KINDS):
+        raise ManifestError(f"{path}: top level must be an object with {' and '.join(KINDS)} lists")
+
+    catalog = {}
+    for kind in KINDS:
+        entries = manifest.get(kind, [])
+        if not isinstance(entries, list):
+            raise ManifestError(f"{path}: {kind} must be a list")
+        garments = {}
+        for index, entry in enumerate(entries):
+            number, params = _validate(kind, index, entry)
+            if number in garments:
+                raise ManifestError(f"{kind}[{index}]: duplicate id {number}")
+            garments[number] = params
+        catalog[kind] = dict(sorted(garments.items()))
+    return catalog
+
+
+CATALOG = load_manifest()
+SHIRTS = CATALOG["shirt"]
+PANTS = CATALOG["pant"]
+
+
+def threshold_mask(image, threshold, invert):
+    """Foreground mask of a BGR garment: pixels brighter than threshold (darker if invert)"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)  # grayscale conversion
+    ret, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
+    if invert:
+        # A light background is what passes the threshold, so flip it
+        mask = cv2.bitwise_not(mask)
+    return mask
+
+
+def source_signature(path, mask, threshold):
+    """What a prepared garment was built from; a mismatch means it is stale"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "mask": mask, "threshold": threshold}
+
+
+def _load_prepared(key, path, mask, threshold):
+    """Return (image, alpha) views into the garment store, or None if missing or stale"""
+    store = garment_store.get_store(PREPARED_DIR)
+    if store is None:
+        return None
+    try:
+        source = source_signature(path, mask, threshold)
+    except OSError:
+        return None
+    return store.get(key, source)
+
+
+class Garment:
+    """A decoded garment image together with its foreground mask"""
+
+    def __init__(self, kind, number, file, anchor, mask="threshold", threshold=0, name=None):
+        self.kind = kind
+        self.number = number
+        self.name = name
+        self.path = os.path.join(script_dir, file)
+        self.threshold = threshold
+        self.invert = mask == "threshold_inv"
+        self.anchor = anchor
+
+        # Garments in the store are mapped, not decoded
+        prepared = _load_prepared(self.key, self.path, mask, threshold)
+        self.prepared = prepared is not None
+        if self.prepared:
+            self.image, self.mask = prepared
+        else:
+            image = cv2.imread(self.path, 1)  # original img in bgr
+            if image is None:
+                raise FileNotFoundError(self.path)
+            self.image = image[:, :, 0:3]
+            self.mask = threshold_mask(self.image, threshold, self.invert)
+        self.height, self.width = self.image.shape[:2]
+
+        # Cached garments are shared between requests, keep them read-only
+        for array in (self.image, self.mask):
+            array.flags.writeable = False
+
+    @property
+    def key(self):
+        return f"{self.kind}{self.number}"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def get_garment(kind, number):
+    """Return the cached Garment, decoding it on first use.
+
+    Raises KeyError for an unknown garment and FileNotFoundError when its
+    image is missing (failures are not cached, so a fixed file is picked up).
+    """
+    params = CATALOG[kind][number]
+    return Garment(kind, number, **params)
+
+
+def get_shirt(number):
+    return get_garment("shirt", number)
+
+
+def get_pant(number):
+    return get_garment("pant", number)
+
+
+def exists(kind, number):
+    return number in CATALOG.get(kind, {})
+
+
+def options(kind):
+    """[(id, name)] for a kind, for the selection dropdowns"""
+    return [(number, params["name"]) for number, params in CATALOG[kind].items()]
+
+
+def preload(limit=CACHE_SIZE):
+    """Decode the first `limit` garments up front so early requests are not slower.
+
+    The rest are decoded lazily; decoding more than the cache holds would only
+    evict the first ones again.
+    """
+    count = 0
+    for kind, garments in CATALOG.items():
+        for number in garments:
+            if count >= limit:
+                return
+            get_garment(kind, number)
+            count += 1
+
+
+def cache_info():
+    return get_garment.cache_info()
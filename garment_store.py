@@ -0,0 +1,102 @@
+"""
+Memory-mapped garment store
+All prepared garments live in one file, garments.bin, next to an index.json
+giving each garment's array offsets and shapes. Every process maps the file
+read-only and hands out numpy views into it, so the Flask process and the
+render workers share the same page-cache pages: opening the store costs
+nothing up front and resident memory does not grow per worker with the
+catalog size.
+
+Written by ingest_garments.py, read by garment_catalog.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+DATA_FILE = "garments.bin"
+INDEX_FILE = "index.json"
+
+# Arrays start on cache-line boundaries
+ALIGN = 64
+
+
+def write_store(out_dir, garments):
+    """Write {key: (image, alpha, source signature)} as one data file plus its index.
+
+    Both files are written under temporary names and renamed into place, so a
+    running server keeps its existing mapping until it reopens the store.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    data_tmp = os.path.join(out_dir, DATA_FILE + ".tmp")
+    index = {"data": DATA_FILE, "garments": {}}
+    offset = 0
+    with open(data_tmp, "wb") as f:
+        for key, (image, alpha, source) in garments.items():
+            entry = {"source": source}
+            for name, array in (("image", image), ("alpha", alpha)):
+                padding = -offset % ALIGN
+                f.write(b"\0" * padding)
+                offset += padding
+                array = np.ascontiguousarray(array, dtype=np.uint8)
+                f.write(array.tobytes())
+                entry[name] = {"offset": offset, "shape": list(array.shape)}
+                offset += array.nbytes
+            index["garments"][key] = entry
+
+    index_tmp = os.path.join(out_dir, INDEX_FILE + ".tmp")
+    with open(index_tmp, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(data_tmp, os.path.join(out_dir, DATA_FILE))
+    os.replace(index_tmp, os.path.join(out_dir, INDEX_FILE))
+    return offset
+
+
+class GarmentStore:
+    """Read-only view of a store written by write_store()"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.entries = index["garments"]
+        path = os.path.join(directory, index["data"])
+        # An empty store cannot be mapped
+        self._data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else None
+
+    def get(self, key, source):
+        """Return (image, alpha) views for key, or None if absent or built from a different source"""
+        entry = self.entries.get(key)
+        if entry is None or entry["source"] != source:
+            return None
+        return self._view(entry["image"]), self._view(entry["alpha"])
+
+    def _view(self, spec):
+        shape = tuple(spec["shape"])
+        size = int(np.prod(shape))
+        return self._data[spec["offset"]:spec["offset"] + size].reshape(shape)
+
+    def stats(self):
+        return {
+            "garments": len(self.entries),
+            "bytes": 0 if self._data is None else int(self._data.size),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(directory):
+    """Return the process-wide GarmentStore for directory, or None if it has not been built"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = GarmentStore(directory)
+                except (OSError, ValueError, KeyError):
+                    return None
+    return _store
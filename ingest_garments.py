@@ -0,0 +1,81 @@
+"""
+Garment ingestion
+Precomputes every catalog garment's BGR image and alpha mask once and packs
+them into the memory-mapped garment store (garment_store.py) in
+garment_catalog.PREPARED_DIR, which the server maps instead of decoding and
+thresholding the images.
+
+The alpha comes from the PNG alpha channel when the image has a real one.
+Otherwise the manifest's threshold rule is applied and cleaned up: an
+opening removes specks, a closing fills pinholes and a small blur softens
+the stair-stepped edge.
+
+Usage:
+  python ingest_garments.py [--kernel 3] [--feather 3]
+
+Re-run after changing an image or its manifest entry; stale entries are
+ignored by the server until then.
+"""
+
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+import garment_catalog
+import garment_store
+
+
+def compute_alpha(raw, params, kernel=3, feather=3):
+    """Return (bgr, alpha, where the alpha came from) for an image read with IMREAD_UNCHANGED"""
+    if raw.ndim == 2:
+        raw = cv2.cvtColor(raw, cv2.COLOR_GRAY2BGR)
+    bgr = np.ascontiguousarray(raw[:, :, 0:3])
+    if raw.shape[2] == 4 and raw[:, :, 3].min() < 255:
+        return bgr, np.ascontiguousarray(raw[:, :, 3]), "png"
+
+    alpha = garment_catalog.threshold_mask(bgr, params["threshold"], params["mask"] == "threshold_inv")
+    if kernel > 1:
+        element = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel, kernel))
+        alpha = cv2.morphologyEx(alpha, cv2.MORPH_OPEN, element)
+        alpha = cv2.morphologyEx(alpha, cv2.MORPH_CLOSE, element)
+    if feather > 1:
+        alpha = cv2.GaussianBlur(alpha, (feather | 1, feather | 1), 0)
+    return bgr, alpha, "threshold"
+
+
+def ingest(out_dir, kernel=3, feather=3):
+    garments = {}
+    for kind, catalog in garment_catalog.CATALOG.items():
+        for number, params in catalog.items():
+            key = f"{kind}{number}"
+            path = os.path.join(garment_catalog.script_dir, params["file"])
+            raw = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if raw is None:
+                print(f"  {key}: cannot read {params['file']}, skipped")
+                continue
+            bgr, alpha, source = compute_alpha(raw, params, kernel, feather)
+            signature = garment_catalog.source_signature(path, params["mask"], params["threshold"])
+            garments[key] = (bgr, alpha, signature)
+            print(f"  {key}: {params['file']} {bgr.shape[1]}x{bgr.shape[0]}, alpha from {source}")
+
+    size = garment_store.write_store(out_dir, garments)
+    return len(garments), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=garment_catalog.PREPARED_DIR, help="output directory")
+    parser.add_argument("--kernel", type=int, default=3, help="morphology kernel size for threshold masks (1 = off)")
+    parser.add_argument("--feather", type=int, default=3, help="edge blur size for threshold masks (1 = off)")
+    args = parser.parse_args()
+
+    print(f"Preparing garments into {args.out}")
+    count, size = ingest(args.out, args.kernel, args.feather)
+    print(f"{count} garments prepared, {size / 1024 / 1024:.1f} MB in {garment_store.DATA_FILE}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""
+Background try-on jobs
+Runs renders for POST /api/tryon?async=1 on a small thread pool so the
+request returns a job id straight away. The result is stored in the result
+cache under the job id, which is unique per job, so two users rendering the
+same outfit never overwrite each other's output.
+"""
+
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+import uuid
+
+import result_cache
+
+THREADS = int(os.environ.get("JOB_THREADS", "2"))
+
+# Jobs allowed queued or running before submit() refuses more
+MAX_PENDING = int(os.environ.get("JOB_QUEUE", "16"))
+
+
+class QueueFull(Exception):
+    """Raised when MAX_PENDING jobs are already queued or running"""
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error = None       # (message, status) when failed
+        self.created = time.monotonic()
+        self.finished = None
+
+    def stats(self):
+        stats = {"id": self.id, "status": self.status}
+        if self.error:
+            stats["error"] = self.error[0]
+        if self.finished:
+            stats["render_time"] = self.finished - self.created
+        return stats
+
+
+class JobQueue:
+    def __init__(self, threads=THREADS, max_pending=MAX_PENDING, cache=None):
+        self.max_pending = max_pending
+        self.cache = cache or result_cache.get_cache()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads,
+                                                               thread_name_prefix="tryon-job")
+        self._jobs = collections.OrderedDict()  # id -> Job, oldest first
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, render, *args, mimetype='image/jpeg'):
+        """Queue render(*args), which returns (bytes, None) or (None, (message, status, ...)).
+
+        The result is served back with mimetype.
+
+        Returns the Job; raises QueueFull when too many jobs are pending.
+        """
+        with self._lock:
+            self._forget_expired()
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull()
+            job = Job()
+            self._jobs[job.id] = job
+            self.pending += 1
+            self.submitted += 1
+        self._executor.submit(self._run, job, render, args, mimetype)
+        return job
+
+    def _run(self, job, render, args, mimetype):
+        job.status = "running"
+        try:
+            data, error = render(*args)
+        except Exception as e:
+            data, error = None, (f"Error: {e}", 500)
+        if error:
+            job.error = error[:2]
+        else:
+            self.cache.put(job.id, data, mimetype)
+        with self._lock:
+            job.finished = time.monotonic()
+            job.status = "failed" if error else "done"
+            self.pending -= 1
+            if error:
+                self.failed += 1
+
+    def get(self, job_id):
+        """Return the Job, or None if the id is unknown or has expired"""
+        with self._lock:
+            self._forget_expired()
+            return self._jobs.get(job_id)
+
+    def _forget_expired(self):
+        # Finished jobs are kept as long as their cached result would be
+        deadline = time.monotonic() - self.cache.ttl
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if job.created > deadline:
+                break
+            if job.finished is not None:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            self._forget_expired()
+            return {
+                "jobs": len(self._jobs),
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide JobQueue"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
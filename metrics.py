@@ -0,0 +1,137 @@
+"""
+Hot-path metrics
+Stage timers, counters and histograms rendered in the Prometheus text format
+for the /metrics endpoint. Set METRICS_ENABLED=0 to turn the timers into a
+shared no-op context manager.
+"""
+
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# ... and in bytes, for encoded image sizes
+SIZE_BUCKETS = (4096, 16384, 32768, 65536, 131072, 262144, 524288, 1048576, 2097152, 4194304)
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}  # label value tuple -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.series = {}  # label value tuple -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(key)} {series[-1]}")
+        return lines
+
+
+def _labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+STAGE_SECONDS = Histogram("tryon_stage_seconds", "Time spent in each try-on pipeline stage")
+REQUESTS = Counter("tryon_requests_total", "Try-on renders requested, by endpoint")
+ATTEMPTS = Counter("tryon_attempts_total", "Frames read and searched for a face in the /predict retry loop")
+NO_FACE = Counter("tryon_no_face_total", "Renders that failed because no face was found, by endpoint")
+ENCODE_SECONDS = Histogram("tryon_encode_seconds", "Time spent encoding results, by codec and tier")
+ENCODED_BYTES = Histogram("tryon_encoded_bytes", "Size of encoded results, by codec and tier", SIZE_BUCKETS)
+
+_metrics = [STAGE_SECONDS, REQUESTS, ATTEMPTS, NO_FACE, ENCODE_SECONDS, ENCODED_BYTES]
+_collectors = []
+
+
+def timer(stage):
+    """Context manager timing one pipeline stage into tryon_stage_seconds"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def inc(counter, amount=1, **labels):
+    if ENABLED:
+        counter.inc(amount, **labels)
+
+
+def register_collector(collect):
+    """Add a callable returning {metric name: (help, type, value)} read at scrape time"""
+    _collectors.append(collect)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, (help_text, kind, value) in sorted(collect().items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,44 @@
+"""
+Shop page helpers
+What the shared templates (index.html, shirt.html, pant.html) need from the
+app that renders them: the garment catalog, the thumbnail() and asset_url()
+template globals and the /assets/ route serving what they point at. Both
+flasktry.py and test_app.py call init_app() on their Flask app.
+
+assets and garment_catalog load on first use, so registering the helpers
+does not import OpenCV.
+"""
+
+from flask import send_from_directory
+
+import startup
+
+assets = startup.lazy("assets")
+garment_catalog = startup.lazy("garment_catalog")
+
+
+def inject_catalog():
+    return {"catalog": garment_catalog.CATALOG}
+
+
+def thumbnail(file, width=None):
+    return assets.thumbnail(file, width)
+
+
+def asset_url(file):
+    return assets.asset_url(file)
+
+
+def built_asset(name):
+    # Names are fingerprinted, so the content behind a URL never changes
+    response = send_from_directory(assets.BUILD_DIR, name, max_age=assets.MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={assets.MAX_AGE}, immutable'
+    return response
+
+
+def init_app(app):
+    """Register the catalog, the template helpers and the /assets/ route on app"""
+    app.context_processor(inject_catalog)
+    app.add_template_global(thumbnail)
+    app.add_template_global(asset_url)
+    app.add_url_rule('/assets/<name>', view_func=built_asset)
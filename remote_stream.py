@@ -0,0 +1,207 @@
+"""
+Remote camera streaming
+A WebSocket server for shoppers who are not sitting at the server: the
+browser sends downscaled JPEG frames from its own camera and gets the dressed
+frames back. Each connection is a streaming.StreamSession, so it has its
+own garment selection and face tracker and shows up in /stream/sessions,
+and POST /stream/<session id> switches its garments.
+
+Frames are handled latest-wins: the receiver only keeps the newest frame a
+session has sent, and the renderer picks it up when the previous composite
+has gone out, so a slow connection or a busy server skips frames instead of
+queueing them. Decoding, rendering and encoding run on a thread pool while
+the event loop only moves bytes.
+
+Protocol (ws://host:REMOTE_STREAM_PORT/?shirt=1&pant=2, wss:// with TLS):
+  server -> client  text {"session": "<id>"} once connected
+  client -> server  binary JPEG frame, or text {"shirt": 3, "pant": 1}
+  server -> client  binary JPEG composite, or text {"error": "..."}
+
+Browsers only give a page the camera in a secure context, so a shopper on
+another machine needs /remote served over https, and an https page may only
+open wss:// sockets. Set REMOTE_STREAM_CERT and REMOTE_STREAM_KEY (PEM files)
+to serve wss:// directly, or put the port behind a TLS terminating proxy.
+
+Needs the optional `websockets` package. Started next to the Flask app by
+`python flasktry.py`, in a WSGI server by REMOTE_STREAM=on, or on its own
+with `python remote_stream.py` (then set REMOTE_STREAM=external so /remote
+offers it).
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import ssl
+import threading
+import urllib.parse
+
+import cv2
+import numpy as np
+
+import garment_catalog
+import streaming
+
+try:
+    import websockets
+except ImportError:  # optional dependency
+    websockets = None
+
+HOST = os.environ.get("REMOTE_STREAM_HOST", "0.0.0.0")
+PORT = int(os.environ.get("REMOTE_STREAM_PORT", "8765"))
+# Certificate chain and private key for wss://; plain ws:// when unset
+CERT = os.environ.get("REMOTE_STREAM_CERT")
+KEY = os.environ.get("REMOTE_STREAM_KEY")
+MAX_SESSIONS = int(os.environ.get("REMOTE_MAX_SESSIONS", "16"))
+THREADS = int(os.environ.get("REMOTE_THREADS", str(os.cpu_count() or 2)))
+
+# Larger incoming messages close the connection (a downscaled JPEG is ~20-60 KB)
+MAX_FRAME_BYTES = 1024 * 1024
+JPEG_QUALITY = 80
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="remote-render")
+
+
+def _render(data, selection, tracker):
+    """Decode, dress and encode one client frame; returns JPEG bytes or None"""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    streaming.render(img, selection, tracker)
+    ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buf.tobytes() if ok else None
+
+
+def _parse_selection(values, default=None):
+    try:
+        shirtno = int(values.get("shirt", default[0] if default else None))
+        pantno = int(values.get("pant", default[1] if default else None))
+    except (TypeError, ValueError):
+        return None
+    if not (garment_catalog.exists("shirt", shirtno) and garment_catalog.exists("pant", pantno)):
+        return None
+    return shirtno, pantno
+
+
+class _Slot:
+    """Holds the newest unrendered frame of one session"""
+
+    def __init__(self):
+        self.frame = None
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def put(self, frame):
+        dropped = self.frame is not None
+        self.frame = frame
+        self.ready.set()
+        return dropped
+
+    async def take(self):
+        await self.ready.wait()
+        self.ready.clear()
+        frame, self.frame = self.frame, None
+        return frame
+
+
+async def _receive(websocket, session, slot):
+    try:
+        async for message in websocket:
+            if isinstance(message, str):
+                try:
+                    selection = _parse_selection(json.loads(message), session.selection)
+                except (ValueError, AttributeError):
+                    selection = None
+                if selection is None:
+                    await websocket.send(json.dumps({"error": "invalid selection"}))
+                else:
+                    session.select(*selection)
+            elif slot.put(message):
+                session.frames_dropped += 1
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        slot.closed = True
+        slot.ready.set()
+
+
+async def _send(websocket, session, slot):
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await slot.take()
+        if slot.closed:
+            return
+        if data is None:
+            continue
+        jpeg = await loop.run_in_executor(_executor, _render, data, session.selection, session.tracker)
+        if jpeg is None:
+            await websocket.send(json.dumps({"error": "could not decode frame"}))
+            continue
+        await websocket.send(jpeg)
+        session.frames_sent += 1
+
+
+async def handle(websocket):
+    """Serve one remote shopper until they disconnect"""
+    request = getattr(websocket, "request", None)
+    path = request.path if request is not None else websocket.path
+    query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(path).query))
+    selection = _parse_selection(query)
+    if selection is None:
+        await websocket.close(1008, "invalid shirt or pant")
+        return
+    if len(streaming.sessions()) >= MAX_SESSIONS:
+        await websocket.close(1013, "too many sessions, try again later")
+        return
+
+    session = streaming.open_session(*selection, session_id=query.get("session"))
+    await websocket.send(json.dumps({"session": session.id}))
+    slot = _Slot()
+    receiver = asyncio.create_task(_receive(websocket, session, slot))
+    try:
+        await _send(websocket, session, slot)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        receiver.cancel()
+        streaming.close_session(session)
+
+
+def ssl_context(cert=CERT, key=KEY):
+    """TLS context for wss:// from PEM files, or None for plain ws://"""
+    if not cert:
+        return None
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def serve(host=HOST, port=PORT):
+    async with websockets.serve(handle, host, port, max_size=MAX_FRAME_BYTES, ssl=ssl_context()):
+        await asyncio.Future()  # run until cancelled
+
+
+_thread = None
+
+
+def start_in_thread(host=HOST, port=PORT):
+    """Run the server on its own event loop in a daemon thread; returns False without websockets"""
+    global _thread
+    if websockets is None:
+        return False
+    if not is_running():
+        _thread = threading.Thread(target=asyncio.run, args=(serve(host, port),), name="remote-stream", daemon=True)
+        _thread.start()
+    return True
+
+
+def is_running():
+    """Whether this process is serving remote streams (the thread dies if e.g. the port is taken)"""
+    return _thread is not None and _thread.is_alive()
+
+
+if __name__ == '__main__':
+    if websockets is None:
+        raise SystemExit("remote streaming needs the websockets package: pip3 install websockets")
+    print(f"Remote stream listening on {'wss' if CERT else 'ws'}://{HOST}:{PORT}")
+    asyncio.run(serve())
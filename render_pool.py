@@ -0,0 +1,277 @@
+"""
+Render worker pool
+Runs try-on renders in separate processes so a slow render does not block
+the Flask threads and all cores get used. Each worker preloads its own
+cascade and garment catalog. Frames travel through shared memory; only the
+small job description and the encoded image are pickled.
+
+Enabled with RENDER_WORKERS=N (0, the default, renders inline).
+"""
+
+import atexit
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import encoding
+
+WORKERS = int(os.environ.get("RENDER_WORKERS", "0"))
+
+# Jobs allowed in flight (running + queued) before submit() refuses more
+QUEUE_SIZE = int(os.environ.get("RENDER_QUEUE", str(max(1, 2 * WORKERS))))
+
+# Seconds a request waits for its render
+TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", "10"))
+
+
+class PoolFull(Exception):
+    """Raised when the pool already has QUEUE_SIZE jobs in flight"""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish within the timeout"""
+
+
+class PoolBroken(Exception):
+    """Raised when a worker process died (e.g. OOM killed); see replace_pool()"""
+
+
+# Worker process side
+
+def _init_worker(ready=None):
+    import face_detector
+    import garment_catalog
+
+    garment_catalog.preload()
+    face_detector.get_detector().load()
+    if ready is not None:
+        ready.release()
+
+
+def _garments(outfits):
+    import garment_catalog
+
+    return [(garment_catalog.get_shirt(shirtno), garment_catalog.get_pant(pantno))
+            for shirtno, pantno in outfits]
+
+
+def _detect(img):
+    import face_detector
+
+    return face_detector.get_detector().detect(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+
+def _render_job(shm_name, shape, dtype, outfits, multi, output, faces=None):
+    """Dress the frame in shared memory and encode it with output (an Encoding).
+
+    faces are detected here when None. Returns (people dressed, encoded
+    bytes or None, encode seconds).
+    """
+    import tryon
+
+    # Spawned workers share the parent's resource tracker, so attaching here
+    # does not add a second owner; the parent unlinks the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if faces is None:
+            faces = _detect(img)
+        dressed = tryon.dress(img, faces, _garments(outfits), multi)
+        data, seconds = None, 0.0
+        if dressed:
+            # Metrics recorded here would stay in the worker; the parent records them
+            data, seconds = output.encode(img, record=False)
+        del img
+        return dressed, data, seconds
+    finally:
+        shm.close()
+
+
+def _batch_job(shm_name, shape, dtype, outfits, faces, labels, output):
+    """Dress the frame in shared memory in every outfit and encode the results.
+
+    With labels the results are encoded as one contact sheet, else one image
+    per outfit. faces are detected here when None. Returns ([encoded bytes
+    or None], [encode seconds]), or (None, []) when no face fits.
+    """
+    import tryon
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if faces is None:
+            faces = _detect(img)
+        results = tryon.dress_batch(img, faces, _garments(outfits))
+        del img
+        if results is None:
+            return None, []
+        if labels is not None:
+            results = [tryon.contact_sheet(results, labels)]
+        encoded = [output.encode(result, record=False) for result in results]
+        return [data for data, _ in encoded], [seconds for _, seconds in encoded]
+    finally:
+        shm.close()
+
+
+# Flask process side
+
+class RenderPool:
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, timeout=TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        # spawn: the parent runs a capture thread, which fork would not copy safely
+        context = multiprocessing.get_context("spawn")
+        # Released once by each worker when it has preloaded; see warm_up()
+        self._ready = context.Semaphore(0)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._ready,),
+        )
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.in_flight = 0
+
+    def render(self, img, outfits, multi=False, output=None, faces=None):
+        """Render img in outfits ([(shirtno, pantno)]) in a worker; returns (people dressed, encoded bytes or None).
+
+        output is the encoding.Encoding to use, the default one if None.
+        faces are the boxes to dress, detected by the worker when None.
+
+        Raises PoolFull when the queue is full, RenderTimeout after timeout
+        and PoolBroken when a worker died.
+        """
+        if output is None:
+            output = encoding.Encoding()
+        dressed, data, seconds = self._run(_render_job, img, outfits, multi, output, faces)
+        output.record(data, seconds)
+        return dressed, data
+
+    def render_batch(self, img, outfits, faces=None, labels=None, output=None):
+        """Render img in every outfit in a worker (tryon.dress_batch()).
+
+        Returns the encoded images, one contact sheet with labels else one
+        per outfit (None where encoding failed), or None when no face fits.
+        Raises like render().
+        """
+        if output is None:
+            output = encoding.Encoding()
+        encoded, seconds = self._run(_batch_job, img, outfits, faces, labels, output)
+        for data, spent in zip(encoded or [], seconds):
+            output.record(data, spent)
+        return encoded
+
+    def _run(self, job, img, *args):
+        """Copy img to shared memory, run job(shm name, shape, dtype, *args) in a worker and return its result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolFull()
+
+        shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+        frame = np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)
+        frame[:] = img
+        del frame
+
+        def release(future):
+            # Runs when the job finishes, even after the caller gave up on it
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(job, shm.name, img.shape, img.dtype.str, *args)
+        except Exception as e:
+            release(None)
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                raise PoolBroken() from e
+            raise
+        future.add_done_callback(release)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise RenderTimeout()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            raise PoolBroken() from e
+
+    def warm_up(self, timeout=60):
+        """Start every worker and wait until each has preloaded its cascade and catalog.
+
+        The executor only spawns a worker when a job finds none idle, so one
+        no-op job per worker starts them all. Raises RenderTimeout if they
+        are not all ready within timeout.
+        """
+        deadline = time.monotonic() + timeout
+        futures = [self._executor.submit(os.getpid) for _ in range(self.workers)]
+        # A worker that fails to start breaks the pool, which these raise
+        for future in futures:
+            future.result(timeout=max(0, deadline - time.monotonic()))
+        # A fast worker may have run several of the jobs; wait for the rest too
+        for _ in range(self.workers):
+            if not self._ready.acquire(timeout=max(0, deadline - time.monotonic())):
+                raise RenderTimeout(f"render workers not ready after {timeout}s")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "restarts": _restarts,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_restarts = 0
+
+
+def get_pool():
+    """Return the process-wide RenderPool, or None when RENDER_WORKERS is 0"""
+    global _pool
+    if WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+            atexit.register(_pool.shutdown)
+    return _pool
+
+
+def replace_pool(broken):
+    """Swap a pool whose worker died for a fresh one (once, however many requests saw it break)"""
+    global _pool, _restarts
+    with _pool_lock:
+        if _pool is broken:
+            atexit.unregister(broken.shutdown)
+            broken.shutdown()
+            _pool = RenderPool()
+            atexit.register(_pool.shutdown)
+            _restarts += 1
+        return _pool
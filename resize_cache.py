@@ -0,0 +1,100 @@
+"""
+Resized garment cache
+Keeps garments (and their masks) already resized to a target box so a
+customer standing still does not pay for cv2.resize on every frame.
+"""
+
+import collections
+import os
+import threading
+
+import cv2
+
+# Face boxes are snapped to this many pixels before placing garments, so small
+# jitter in the detected face size maps to the same cached size
+QUANTUM = int(os.environ.get("RESIZE_QUANTUM", "4"))
+
+# Maximum number of resized garment+mask entries kept, and the memory they
+# may use (an HD-sized garment is several MB, so the count alone is no bound)
+CACHE_SIZE = int(os.environ.get("RESIZE_CACHE_SIZE", "128"))
+CACHE_BYTES = int(float(os.environ.get("RESIZE_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def _nbytes(entry):
+    resized, mask = entry
+    return resized.nbytes + (mask.nbytes if mask is not None else 0)
+
+
+class ResizeCache:
+    """LRU cache of resized (image, mask) pairs keyed by (garment key, width, height, interpolation)"""
+
+    def __init__(self, maxsize=CACHE_SIZE, max_bytes=CACHE_BYTES):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, image, mask, width, height, interpolation=cv2.INTER_AREA):
+        """Return image and mask resized to (width, height), from cache if possible"""
+        entry_key = (key, width, height, interpolation)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Resize outside the lock; a concurrent miss on the same key just
+        # does the work twice
+        resized = cv2.resize(image, (width, height), interpolation=interpolation)
+        resized.flags.writeable = False
+        if mask is not None:
+            mask = cv2.resize(mask, (width, height), interpolation=interpolation)
+            mask.flags.writeable = False
+        entry = (resized, mask)
+
+        with self._lock:
+            previous = self._entries.pop(entry_key, None)
+            if previous is not None:
+                self._used -= _nbytes(previous)
+            self._entries[entry_key] = entry
+            self._used += _nbytes(entry)
+            # The newest entry stays even if it alone is over the byte budget
+            while len(self._entries) > 1 and (len(self._entries) > self.maxsize or self._used > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._used -= _nbytes(evicted)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._used = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": self._used,
+                "max_bytes": self.max_bytes,
+                "quantum": QUANTUM,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = ResizeCache()
+
+
+def get_cache():
+    """Return the process-wide ResizeCache"""
+    return _cache
@@ -0,0 +1,135 @@
+"""
+Render result cache
+Holds encoded try-on results under unique keys with a time-to-live. Entries
+live in memory up to a byte budget; the least recently used ones spill to
+disk when RESULT_CACHE_DIR is set, and the disk tier has its own budget, so
+memory and disk use stay flat under sustained load.
+
+Several processes (e.g. WSGI workers) may share RESULT_CACHE_DIR: each only
+deletes its own files, plus files older than the TTL, which nobody can
+still be serving (left by an earlier run or a crashed process).
+"""
+
+import collections
+import os
+import threading
+import time
+
+TTL = float(os.environ.get("RESULT_CACHE_TTL", "300"))
+MEMORY_BYTES = int(float(os.environ.get("RESULT_CACHE_MB", "64")) * 1024 * 1024)
+DISK_DIR = os.environ.get("RESULT_CACHE_DIR")
+DISK_BYTES = int(float(os.environ.get("RESULT_CACHE_DISK_MB", "256")) * 1024 * 1024)
+
+
+class ResultCache:
+    def __init__(self, ttl=TTL, memory_bytes=MEMORY_BYTES, disk_dir=DISK_DIR, disk_bytes=DISK_BYTES):
+        self.ttl = ttl
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._memory = collections.OrderedDict()  # key -> (expires, data, mimetype)
+        self._disk = collections.OrderedDict()    # key -> (expires, path, size, mimetype)
+        self._memory_used = 0
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._sweep()
+
+    def put(self, key, data, mimetype='image/jpeg'):
+        """Store data under key (keys must be unique, e.g. a job id)"""
+        with self._lock:
+            self._expire()
+            self._memory[key] = (time.monotonic() + self.ttl, data, mimetype)
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                old_key, (expires, old_data, old_type) = self._memory.popitem(last=False)
+                self._memory_used -= len(old_data)
+                self._spill(old_key, expires, old_data, old_type)
+
+    def get(self, key):
+        """Return (data, mimetype) or None if missing or expired"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry[1], entry[2]
+            entry = self._disk.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        try:
+            with open(entry[1], 'rb') as f:
+                return f.read(), entry[3]
+        except OSError:
+            return None
+
+    def _spill(self, key, expires, data, mimetype):
+        if not self.disk_dir:
+            self.evictions += 1
+            return
+        # The key is unique, so the file name never collides with another result
+        path = os.path.join(self.disk_dir, f"{key}.bin")
+        with open(path, 'wb') as f:
+            f.write(data)
+        self._disk[key] = (expires, path, len(data), mimetype)
+        self._disk_used += len(data)
+        while self._disk_used > self.disk_bytes and self._disk:
+            self._drop_disk(next(iter(self._disk)))
+            self.evictions += 1
+
+    def _drop_disk(self, key):
+        expires, path, size, mimetype = self._disk.pop(key)
+        self._disk_used -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _expire(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        # get() reorders memory entries and they spill in that order, so
+        # neither tier is in expiry order: scan both
+        for key in [k for k, entry in self._memory.items() if entry[0] <= now]:
+            expires, data, mimetype = self._memory.pop(key)
+            self._memory_used -= len(data)
+            self.expirations += 1
+        for key in [k for k, entry in self._disk.items() if entry[0] <= now]:
+            self._drop_disk(key)
+            self.expirations += 1
+
+    def _sweep(self):
+        """Delete result files older than the ttl; they were written after their put(), so all are expired"""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            try:
+                if name.endswith(".bin") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass  # another process removed it first
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {
+                "ttl": self.ttl,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_used,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache = ResultCache()
+
+
+def get_cache():
+    """Return the process-wide ResultCache"""
+    return _cache
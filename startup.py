@@ -0,0 +1,114 @@
+"""
+Cold start
+Deferred imports, the warm-up hook and the readiness state behind /ready.
+
+flasktry imports OpenCV, numpy and the pipeline modules through lazy(), so
+importing the app only costs Flask and each heavy module loads when it is
+first used. warm_up() loads them on purpose, preloads the detector's
+cascades and the garment catalog, starts the render workers and waits until
+each has preloaded too, and runs one synthetic render, then marks the process
+ready.
+
+WARM_UP decides when that happens in a process that imports the app, e.g.
+a WSGI server worker:
+  background - (default) warm up in a thread right after import; /ready
+               answers 503 until it is done
+  off        - never warm up on its own; the first requests pay the cost
+`python flasktry.py` always warms up before it starts serving.
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+import types
+
+WARM_UP = os.environ.get("WARM_UP", "background")
+
+_state = {
+    "ready": False,
+    "import_seconds": None,
+    "warm_up_seconds": None,
+    "error": None,
+}
+_lock = threading.Lock()
+
+
+class _Deferred(types.ModuleType):
+    """Stands in for a module until one of its attributes is used"""
+
+    def __getattr__(self, attr):
+        # The import system locks per module, so concurrent first uses are safe
+        return getattr(importlib.import_module(self.__name__), attr)
+
+
+def lazy(name):
+    """Return name's module if already imported, else a stand-in that imports it on first use"""
+    return sys.modules.get(name) or _Deferred(name)
+
+
+def imported(seconds):
+    """Record how long importing the app took"""
+    _state["import_seconds"] = seconds
+
+
+def warm_up():
+    """Load everything the first request would need, then mark the process ready.
+
+    Safe to call more than once or from several threads; later calls wait for
+    the first one. Returns True when the process is ready.
+    """
+    with _lock:
+        if _state["ready"]:
+            return True
+        start = time.perf_counter()
+        try:
+            _warm_up()
+        except Exception as e:
+            _state["error"] = f"{type(e).__name__}: {e}"
+            return False
+        _state.update(ready=True, error=None, warm_up_seconds=time.perf_counter() - start)
+        return True
+
+
+def _warm_up():
+    import cv2
+    import numpy as np
+
+    import assets
+    import encoding
+    import face_detector
+    import garment_catalog
+    import render_pool
+    import tryon
+
+    assets.build()
+    garment_catalog.preload()
+    detector = face_detector.get_detector()
+    detector.load(detector.pool_size)
+    pool = render_pool.get_pool()
+    if pool is not None:
+        pool.warm_up()
+
+    # One synthetic render so the first request does not pay the first-call
+    # costs of detectMultiScale, resize, blur and the JPEG encoder
+    img = np.full((480, 640, 3), 128, np.uint8)
+    detector.detect(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    shirt = garment_catalog.get_shirt(next(iter(garment_catalog.SHIRTS)))
+    pant = garment_catalog.get_pant(next(iter(garment_catalog.PANTS)))
+    tryon.dress_frame(img, [(280, 60, 80, 80)], shirt, pant)
+    encoding.Encoding().encode(img, record=False)
+
+
+def start_background():
+    """Run warm_up() in a thread; not a daemon, so exiting mid-warm-up waits instead of tearing OpenCV down under it"""
+    threading.Thread(target=warm_up, name="warm-up").start()
+
+
+def is_ready():
+    return _state["ready"]
+
+
+def status():
+    return dict(_state)
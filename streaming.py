@@ -0,0 +1,125 @@
+"""
+MJPEG streaming
+Serves composited frames from the shared camera as a multipart/x-mixed-replace
+stream. Each client always renders the newest frame (older ones are dropped
+when it falls behind) and is capped at a target frame rate.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+import cv2
+
+import face_tracker
+import garment_catalog
+import tryon
+
+BOUNDARY = "frame"
+
+# Upper bound on the per-client frame rate a client may ask for
+MAX_FPS = float(os.environ.get("STREAM_MAX_FPS", "15"))
+
+
+class StreamSession:
+    """Garment selection and counters for one connected stream client"""
+
+    def __init__(self, session_id, shirtno, pantno, fps):
+        self.id = session_id
+        self.selection = (shirtno, pantno)  # swapped atomically by select()
+        self.fps = min(fps, MAX_FPS)
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.started = time.time()
+        self.tracker = face_tracker.FaceTracker()
+
+    def select(self, shirtno, pantno):
+        self.selection = (shirtno, pantno)
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "shirt": self.selection[0],
+            "pant": self.selection[1],
+            "fps": self.fps,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "tracker": self.tracker.stats(),
+            "uptime": time.time() - self.started,
+        }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(shirtno, pantno, fps=MAX_FPS, session_id=None):
+    session = StreamSession(session_id or uuid.uuid4().hex, shirtno, pantno, fps)
+    with _sessions_lock:
+        _sessions[session.id] = session
+    return session
+
+
+def get_session(session_id):
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+
+def close_session(session):
+    with _sessions_lock:
+        if _sessions.get(session.id) is session:
+            del _sessions[session.id]
+
+
+def sessions():
+    with _sessions_lock:
+        return [session.stats() for session in _sessions.values()]
+
+
+def render(img, selection, tracker):
+    """Dress img in place for the given (shirtno, pantno); a frame without a face is left as is"""
+    shirt_garment = garment_catalog.get_shirt(selection[0])
+    pant_garment = garment_catalog.get_pant(selection[1])
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    faces = tracker.update(gray)
+    return tryon.dress_frame(img, faces, shirt_garment, pant_garment)
+
+
+def generate(session, camera):
+    """Yield multipart JPEG parts for session until the camera stops or the client goes away"""
+    interval = 1.0 / session.fps
+    next_frame = time.monotonic()
+    seq = 0
+    try:
+        while True:
+            # Always take the newest frame; anything captured while this client
+            # was busy rendering or sending is skipped
+            frame = camera.wait_for_frame(after=seq)
+            if frame is None:
+                break
+            if seq:
+                session.frames_dropped += frame[0] - seq - 1
+            seq = frame[0]
+
+            img = frame[2].copy()  # shared frame is read-only, draw on a copy
+            render(img, session.selection, session.tracker)
+            ok, buf = cv2.imencode('.jpg', img)
+            if not ok:
+                continue
+
+            yield (b'--' + BOUNDARY.encode() + b'\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'Content-Length: ' + str(len(buf)).encode() + b'\r\n\r\n'
+                   + buf.tobytes() + b'\r\n')
+            session.frames_sent += 1
+
+            # Frame rate cap
+            next_frame += interval
+            now = time.monotonic()
+            if next_frame > now:
+                time.sleep(next_frame - now)
+            else:
+                next_frame = now
+    finally:
+        close_session(session)
@@ -8,8 +8,13 @@ from flask_cors import CORS
 import cv2
 import os
 
+import camera_capture
+import compositing
+import pages
+
 app = Flask(__name__)
 CORS(app)
+pages.init_app(app)
 
 # Ensure output directory exists
 os.makedirs('static/output', exist_ok=True)
@@ -38,19 +43,15 @@ def test_overlay():
     # Get script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    # Open camera
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+    # Grab the latest frame from the shared camera (already warmed up)
+    camera = camera_capture.get_camera()
+    if not camera.is_opened():
         return "Error: Cannot access camera", 500
     
-    # Read a frame
-    import time
-    time.sleep(0.5)
-    ret, img = cap.read()
-    cap.release()
-    
-    if not ret or img is None:
+    frame = camera.wait_for_frame()
+    if frame is None:
         return "Error: Cannot read from camera", 500
+    img = frame[2].copy()
     
     # Load shirt and pant
     shirt_images = [
@@ -100,13 +101,9 @@ def test_overlay():
         shirt_w = width - shirt_x
     
     if shirt_w > 0 and shirt_h > 0:
-        shirt_resized = cv2.resize(imgshirt, (shirt_w, shirt_h))
-        # Simple alpha blend
-        alpha = 0.7
-        roi = img[shirt_y:shirt_y+shirt_h, shirt_x:shirt_x+shirt_w]
-        if roi.shape[:2] == shirt_resized.shape[:2]:
-            blended = cv2.addWeighted(roi, 1-alpha, shirt_resized, alpha, 0)
-            img[shirt_y:shirt_y+shirt_h, shirt_x:shirt_x+shirt_w] = blended
+        # Simple alpha blend (no mask, 70% opacity)
+        compositing.blend(img, (shirt_x, shirt_y, shirt_x+shirt_w, shirt_y+shirt_h), imgshirt,
+                          opacity=0.7, interpolation=cv2.INTER_LINEAR)
     
     # Process pant overlay
     pant_w = int(face_w * 2)
@@ -123,12 +120,8 @@ def test_overlay():
         pant_w = width - pant_x
     
     if pant_w > 0 and pant_h > 0:
-        pant_resized = cv2.resize(imgpant, (pant_w, pant_h))
-        alpha = 0.7
-        roi = img[pant_y:pant_y+pant_h, pant_x:pant_x+pant_w]
-        if roi.shape[:2] == pant_resized.shape[:2]:
-            blended = cv2.addWeighted(roi, 1-alpha, pant_resized, alpha, 0)
-            img[pant_y:pant_y+pant_h, pant_x:pant_x+pant_w] = blended
+        compositing.blend(img, (pant_x, pant_y, pant_x+pant_w, pant_y+pant_h), imgpant,
+                          opacity=0.7, interpolation=cv2.INTER_LINEAR)
     
     # Save output
     output_filename = f'test_output_{shirtno}_{pantno}.jpg'
@@ -0,0 +1,138 @@
+"""
+Pins compositing against the two code paths it replaced: the bitwise mask
+overlay in the old predict() and the addWeighted overlay in test_app.py.
+"""
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import compositing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRAME_SHAPE = (480, 640, 3)
+
+
+def frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, FRAME_SHAPE, dtype=np.uint8)
+
+
+def garment(name, threshold, invert=False):
+    """A catalog image and its mask, thresholded the way predict() did"""
+    image = cv2.imread(os.path.join(ROOT, name), 1)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
+    if invert:
+        mask = cv2.bitwise_not(mask)
+    return image, mask
+
+
+def old_predict_overlay(img, box, image, mask):
+    """The per-garment overlay of the old predict()"""
+    x1, y1, x2, y2 = box
+    width, height = x2 - x1, y2 - y1
+    garment = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    mask_small = cv2.resize(mask, (width, height), interpolation=cv2.INTER_AREA)
+    mask_inv = cv2.resize(cv2.bitwise_not(mask), (width, height), interpolation=cv2.INTER_AREA)
+    roi = img[y1:y2, x1:x2]
+    roi_bg = cv2.bitwise_and(roi, roi, mask=mask_inv)
+    roi_fg = cv2.bitwise_and(garment, garment, mask=mask_small)
+    img[y1:y2, x1:x2] = cv2.add(roi_bg, roi_fg)
+
+
+def old_test_overlay(img, box, image, alpha=0.7):
+    """The per-garment overlay of the old test_app.py test_overlay()"""
+    x1, y1, x2, y2 = box
+    garment = cv2.resize(image, (x2 - x1, y2 - y1))
+    roi = img[y1:y2, x1:x2]
+    img[y1:y2, x1:x2] = cv2.addWeighted(roi, 1 - alpha, garment, alpha, 0)
+
+
+@pytest.mark.parametrize("name, threshold, invert, box", [
+    ("shirt1.png", 0, False, (120, 100, 360, 400)),
+    ("shirt51.jpg", 200, True, (200, 60, 420, 330)),
+    ("pant7.jpg", 100, False, (80, 200, 300, 480)),
+    ("pant21.png", 50, False, (300, 150, 460, 470)),
+])
+def test_blend_matches_predict_overlay(name, threshold, invert, box):
+    # Tolerance: exact wherever the resized mask is fully on or off. On mask
+    # edges the old saturating add is replaced by a real blend, so there the
+    # result only has to lie between the frame and the garment (+-1 level).
+    image, mask = garment(name, threshold, invert)
+    background = frame()
+    old = background.copy()
+    new = background.copy()
+    old_predict_overlay(old, box, image, mask)
+    compositing.blend(new, box, image, mask)
+
+    x1, y1, x2, y2 = box
+    mask_small = cv2.resize(mask, (x2 - x1, y2 - y1), interpolation=cv2.INTER_AREA)
+    solid = (mask_small == 0) | (mask_small == 255)
+    assert np.array_equal(old[y1:y2, x1:x2][solid], new[y1:y2, x1:x2][solid])
+
+    edge = ~solid
+    behind = background[y1:y2, x1:x2][edge].astype(int)
+    front = cv2.resize(image, (x2 - x1, y2 - y1), interpolation=cv2.INTER_AREA)[edge].astype(int)
+    blended = new[y1:y2, x1:x2][edge].astype(int)
+    assert np.all(blended >= np.minimum(behind, front) - 1)
+    assert np.all(blended <= np.maximum(behind, front) + 1)
+
+    # Nothing outside the box is touched
+    outside = np.ones(FRAME_SHAPE[:2], bool)
+    outside[y1:y2, x1:x2] = False
+    assert np.array_equal(old[outside], new[outside])
+
+
+@pytest.mark.parametrize("name, box", [
+    ("shirt2.png", (160, 120, 480, 400)),
+    ("pant21.png", (200, 240, 360, 480)),
+])
+def test_blend_matches_test_overlay(name, box):
+    # Tolerance: within 1 level per channel (rounding of addWeighted vs blendLinear)
+    image = cv2.imread(os.path.join(ROOT, name), 1)
+    old = frame(1)
+    new = old.copy()
+    old_test_overlay(old, box, image)
+    compositing.blend(new, box, image, opacity=0.7, interpolation=cv2.INTER_LINEAR)
+    assert np.abs(old.astype(int) - new.astype(int)).max() <= 1
+
+
+def test_blend_resized_without_mask_matches_add_weighted():
+    # Tolerance: within 1 level per channel
+    box = (10, 20, 110, 220)
+    garment_img = np.random.default_rng(2).integers(0, 256, (200, 100, 3), dtype=np.uint8)
+    old = frame(3)
+    new = old.copy()
+    roi = old[20:220, 10:110]
+    old[20:220, 10:110] = cv2.addWeighted(roi, 0.3, garment_img, 0.7, 0)
+    compositing.blend_resized(new, box, garment_img, None, opacity=0.7)
+    assert np.abs(old.astype(int) - new.astype(int)).max() <= 1
+
+
+PANT_ANCHOR = (-1, 3, 5, 10)
+
+
+@pytest.mark.parametrize("anchor, face, expected", [
+    # Inside the frame
+    (PANT_ANCHOR, (100, 20, 20, 20), (80, 120, 140, 220)),
+    # Left edge: x1 clamped to 0
+    (PANT_ANCHOR, (10, 20, 20, 20), (0, 120, 50, 220)),
+    # Right and bottom edges: x2 and y2 clamped to the frame
+    (PANT_ANCHOR, (600, 100, 40, 40), (560, 300, 640, 480)),
+    # Fractional anchors are truncated to whole pixels
+    ((-0.5, 2, 4, 9), (101, 11, 21, 21), (90, 95, 132, 200)),
+    # Zero width
+    ((0, 0, 5, 10), (100, 20, 20, 20), None),
+    # Negative top: y1 clamped to 0
+    ((-1, 3, -2, 4), (100, 20, 20, 20), (80, 0, 140, 100)),
+    # Entirely above the frame
+    ((-1, 3, -5, -2), (100, 20, 20, 20), None),
+    # Entirely off the left edge (left + width <= 0)
+    ((-4, 2, 0, 2), (10, 20, 20, 20), None),
+    # Entirely off the right edge
+    ((2, 2, 0, 2), (600, 20, 40, 40), None),
+])
+def test_garment_box_clipping(anchor, face, expected):
+    assert compositing.garment_box(anchor, face, FRAME_SHAPE) == expected
@@ -0,0 +1,220 @@
+"""
+Try-on overlay pipeline
+Places the selected shirt and pant on a frame given the detected faces.
+Shared by the webcam /predict flow, the upload /api/tryon endpoint and the
+batch renderer, which dresses one frame in several outfits. dress_people()
+dresses everyone in the frame, each person in their own outfit.
+"""
+
+import concurrent.futures
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+import background
+import compositing
+import metrics
+import resize_cache
+
+# Threads resizing different people's garments at once (OpenCV releases the GIL)
+THREADS = int(os.environ.get("MULTI_THREADS", "4"))
+
+
+def _outfit_boxes(img, face, outfit):
+    """Return [(garment, box)] for an outfit (shirt, pant), pant first, or None"""
+    shirt_garment, pant_garment = outfit
+    layers = []
+    for garment in (pant_garment, shirt_garment):
+        box = compositing.garment_box(garment.anchor, face, img.shape)
+        # Skip if dimensions are invalid
+        if box is None:
+            return None
+        layers.append((garment, box))
+    return layers
+
+
+# The steps of dressing one frame, in order: place(), blur_around(),
+# resize_layers() and composite(). bench_pipeline.py times them one by one.
+
+def place(img, faces, outfits):
+    """Pick the first face every outfit fits on and mark the faces tried on img.
+
+    Returns (face box, [layers per outfit]) or None when no face is usable.
+    """
+    for (x, y, w, h) in faces:
+        cv2.rectangle(img, (x, y), (x+w, y+h), (255, 0, 0), 2)
+        cv2.rectangle(img, (100, 200), (312, 559), (255, 255, 255), 2)
+        # Snap the face size so nearby distances reuse cached garment sizes
+        face = compositing.quantize_face((x, y, w, h), resize_cache.QUANTUM)
+        placed = [_outfit_boxes(img, face, outfit) for outfit in outfits]
+        if any(layers is None for layers in placed):
+            continue
+        return (x, y, w, h), placed
+
+    return None
+
+
+def blur_around(img, face, placed, blur=None):
+    """Blur img in place except the face and every placed garment box.
+
+    blur turns it on/off; None uses background.ENABLED. Returns whether it blurred.
+    """
+    if blur is None:
+        blur = background.ENABLED
+    if not blur:
+        return False
+    x, y, w, h = face
+    # One blur pass, leaving the face and every garment box sharp
+    keep = [(x, y, x+w, y+h)] + [box for layers in placed for _, box in layers]
+    with metrics.timer('blur'):
+        background.blur_background(img, keep)
+    return True
+
+
+def resize_layers(layers):
+    """[(box, (resized garment, resized mask))] for one outfit's layers"""
+    return [
+        (box, compositing.resized(garment.image, garment.mask, box[2] - box[0], box[3] - box[1],
+                                  key=garment.key))
+        for garment, box in layers
+    ]
+
+
+def composite(img, resized):
+    """Blend resize_layers()'s garments onto img in place"""
+    # Pant first, then the shirt over it
+    for box, (garment, mask) in resized:
+        compositing.blend_resized(img, box, garment, mask)
+
+
+def _prepare(img, faces, outfits, blur):
+    """place() and blur_around(); returns place()'s result"""
+    prepared = place(img, faces, outfits)
+    if prepared is not None:
+        blur_around(img, *prepared, blur)
+    return prepared
+
+
+def _apply(img, layers):
+    """Resize and composite one outfit's garments onto img in place"""
+    with metrics.timer('resize'):
+        resized = resize_layers(layers)
+    with metrics.timer('composite'):
+        composite(img, resized)
+
+
+def dress_frame(img, faces, shirt_garment, pant_garment, blur=None):
+    """Draw the garments onto img (in place) for the first usable face.
+
+    blur turns the background blur on/off; None uses background.ENABLED.
+    Returns True when a face was dressed, False otherwise.
+    """
+    prepared = _prepare(img, faces, [(shirt_garment, pant_garment)], blur)
+    if prepared is None:
+        return False
+    _apply(img, prepared[1][0])
+    return True
+
+
+def dress_batch(img, faces, outfits, blur=None):
+    """Render every (shirt_garment, pant_garment) outfit on copies of img.
+
+    The face, the rectangles and the background blur are computed once on img
+    and shared by all outfits. Returns a list of frames, or None if no face fits.
+    """
+    prepared = _prepare(img, faces, outfits, blur)
+    if prepared is None:
+        return None
+    results = []
+    for layers in prepared[1]:
+        out = img.copy()
+        _apply(out, layers)
+        results.append(out)
+    return results
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(max_workers=THREADS,
+                                                                  thread_name_prefix="tryon-resize")
+    return _executor
+
+
+def dress_people(img, faces, outfits, blur=None):
+    """Dress every face in img (in place), each person in their own outfit.
+
+    outfits[i] is the (shirt_garment, pant_garment) for the i-th face from
+    the left; people beyond the list wear the last outfit. Larger faces are
+    taken to be closer to the camera and drawn over smaller ones where the
+    garments overlap. Returns the number of people dressed.
+    """
+    people = []
+    for index, (x, y, w, h) in enumerate(sorted(faces, key=lambda face: face[0])):
+        outfit = outfits[min(index, len(outfits) - 1)]
+        face = compositing.quantize_face((x, y, w, h), resize_cache.QUANTUM)
+        layers = _outfit_boxes(img, face, outfit)
+        if layers is not None:
+            people.append(((x, y, w, h), layers))
+    if not people:
+        return 0
+
+    for (x, y, w, h), _ in people:
+        cv2.rectangle(img, (x, y), (x+w, y+h), (255, 0, 0), 2)
+    cv2.rectangle(img, (100, 200), (312, 559), (255, 255, 255), 2)
+
+    if blur is None:
+        blur = background.ENABLED
+    if blur:
+        # One blur pass for the whole group
+        keep = [(x, y, x+w, y+h) for (x, y, w, h), _ in people]
+        keep += [box for _, layers in people for _, box in layers]
+        with metrics.timer('blur'):
+            background.blur_background(img, keep)
+
+    # Back to front: smaller faces are further away
+    people.sort(key=lambda person: person[0][2] * person[0][3])
+    with metrics.timer('resize'):
+        if len(people) == 1:
+            resized = [resize_layers(people[0][1])]
+        else:
+            resized = list(_get_executor().map(resize_layers, [layers for _, layers in people]))
+    # Compositing stays in depth order so the nearer person ends up on top
+    with metrics.timer('composite'):
+        for person in resized:
+            composite(img, person)
+    return len(people)
+
+
+def dress(img, faces, outfits, multi=False):
+    """dress_people() with multi, else dress_frame() in outfits[0]; returns the people dressed"""
+    if multi:
+        return dress_people(img, faces, outfits)
+    return int(dress_frame(img, faces, *outfits[0]))
+
+
+def contact_sheet(images, labels, thumb_width=320):
+    """Tile images into one grid image, each with its label in the corner"""
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    height, width = images[0].shape[:2]
+    thumb_height = int(height * thumb_width / width)
+
+    sheet = np.zeros((rows * thumb_height, columns * thumb_width, 3), np.uint8)
+    for index, (image, label) in enumerate(zip(images, labels)):
+        row, column = divmod(index, columns)
+        x = column * thumb_width
+        y = row * thumb_height
+        sheet[y:y+thumb_height, x:x+thumb_width] = cv2.resize(
+            image, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+        cv2.putText(sheet, label, (x + 8, y + 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return sheet